@@ -1,8 +1,12 @@
+import os
+import csv
 import sys
 import json
+import hashlib
 import argparse
-import pandas as pd
 import logging
+from datetime import date, datetime, time
+from itertools import islice
 
 # Configure logging
 logging.basicConfig(
@@ -11,37 +15,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# "full" returns every row (DataFrame path), "header" only columns and a row
+# count, "preview" adds the rows in [offset, offset + limit)
+ANALYZE_MODES = ("full", "header", "preview")
+DEFAULT_PREVIEW_LIMIT = 20
 
-def analyze_file(file_path):
+# Results are cached as JSON keyed by the file's sha256, mode and page;
+# ANALYZE_CACHE=0 disables, ANALYZE_CACHE_DIR overrides the location
+ANALYZE_CACHE = os.environ.get("ANALYZE_CACHE", "1") != "0"
+ANALYZE_CACHE_DIR = os.environ.get("ANALYZE_CACHE_DIR")
+
+STUDENT_ID_COLUMNS = ['student_id', 'id', 'student id']
+
+
+def describe_columns(columns, total_rows):
+    """The summary fields shared by every mode."""
+    return {
+        'total_rows': total_rows,
+        'columns': columns,  # Send all column names dynamically
+        'has_response': 'response' in columns,
+        'has_student_id': any(
+            str(col).lower() in STUDENT_ID_COLUMNS for col in columns),
+    }
+
+
+def analyze_file(file_path, mode="full", offset=0, limit=DEFAULT_PREVIEW_LIMIT):
     """
-    Analyze an Excel file and return its full structure dynamically.
+    Analyze an Excel or CSV file and return its structure.
+
+    "full" loads the whole table into preview_data. "header" and "preview"
+    stream the file without building a DataFrame.
     """
+    if mode not in ANALYZE_MODES:
+        return {'error': f"Unknown analysis mode: {mode}"}
+    offset, limit = max(int(offset or 0), 0), max(int(limit or 0), 0)
+
     try:
-        # Determine file type by extension
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
+        cache_path = get_cache_path(file_path, mode, offset, limit)
+        cached = read_cached(cache_path)
+        if cached is not None:
+            logger.info(f"Using cached analysis for {file_path}")
+            return cached
+
+        if mode == "full":
+            result = analyze_full(file_path)
         else:
-            df = pd.read_excel(file_path)
-
-        # Check for required columns
-        has_response = 'response' in df.columns
-        has_student_id = any(
-            col.lower() in ['student_id', 'id', 'student id'] for col in df.columns)
-
-        # Convert the entire dataframe to a list of dictionaries (full table format)
-        preview_data = df.fillna("").to_dict(orient="records")
-
-        result = {
-            'total_rows': len(df),
-            'columns': list(df.columns),  # Send all column names dynamically
-            'has_response': has_response,
-            'has_student_id': has_student_id,
-            'preview_data': preview_data  # Send all row data
-        }
+            result = analyze_streamed(
+                file_path, offset, limit if mode == "preview" else 0)
+            if mode == "preview":
+                result.update({'offset': offset, 'limit': limit})
 
-        logger.info(f"Successfully analyzed Excel file: {file_path}")
-        logger.info(f"Found {len(df)} rows and {len(df.columns)} columns")
+        logger.info(f"Successfully analyzed Excel file: {file_path} ({mode})")
+        logger.info(
+            f"Found {result['total_rows']} rows and {len(result['columns'])} columns")
 
+        write_cached(cache_path, result)
         return result
 
     except Exception as e:
@@ -51,19 +79,168 @@ def analyze_file(file_path):
         }
 
 
+def analyze_full(file_path):
+    # pandas is only needed here; the streamed modes skip its import cost
+    import pandas as pd
+
+    # Determine file type by extension
+    if file_path.endswith('.csv'):
+        df = pd.read_csv(file_path)
+    else:
+        df = pd.read_excel(file_path)
+
+    result = describe_columns(list(df.columns), len(df))
+    # Convert the entire dataframe to a list of dictionaries (full table format)
+    result['preview_data'] = [
+        {key: json_value(value) for key, value in row.items()}
+        for row in df.fillna("").to_dict(orient="records")
+    ]
+    return result
+
+# ============================
+# 🔹 Streaming Fast Path
+# ============================
+# Only the header, a row count and the requested page are read. Rows are
+# counted in one streamed pass for both formats; a sheet's stored dimensions
+# are missing from some writers (openpyxl write-only) and include blank or
+# formatted-only rows in others, so header and preview modes could disagree.
+# Blank rows are skipped, as pandas does.
+
+
+def analyze_streamed(file_path, offset, limit):
+    if file_path.endswith('.csv'):
+        columns, total_rows, rows = read_csv_rows(file_path)
+    else:
+        columns, total_rows, rows = read_sheet_rows(file_path)
+
+    preview_data = []
+    try:
+        for values in islice(rows, offset, offset + limit):
+            preview_data.append({
+                column: json_value(value)
+                for column, value in zip(columns, values)})
+    finally:
+        rows.close()
+
+    result = describe_columns(columns, total_rows)
+    result['preview_data'] = preview_data
+    return result
+
+
+def read_csv_rows(file_path):
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        total_rows = sum(1 for values in reader if any(values))
+
+    def rows():
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from (values for values in reader if any(values))
+
+    return columns, total_rows, rows()
+
+
+def read_sheet_rows(file_path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    sheet = workbook.worksheets[0]
+    header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    columns = [str(value) if value is not None else f"Unnamed: {i}"
+               for i, value in enumerate(header)]
+
+    def non_blank():
+        return (values for values in sheet.iter_rows(min_row=2, values_only=True)
+                if any(value is not None for value in values))
+
+    total_rows = sum(1 for _ in non_blank())
+
+    def rows():
+        try:
+            yield from non_blank()
+        finally:
+            workbook.close()
+
+    return columns, total_rows, rows()
+
+
+def json_value(value):
+    """Cell value as something json.dumps accepts (blank cells become "")."""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+# ============================
+# 🔹 Analysis Cache
+# ============================
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_cache_path(file_path, mode, offset, limit):
+    if not ANALYZE_CACHE:
+        return None
+    cache_dir = ANALYZE_CACHE_DIR or os.path.join(
+        os.path.dirname(os.path.abspath(file_path)), ".analysis_cache")
+    page = f"-{offset}-{limit}" if mode == "preview" else ""
+    return os.path.join(cache_dir, f"{file_sha256(file_path)}-{mode}{page}.json")
+
+
+def read_cached(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable analysis cache {cache_path}: {e}")
+        return None
+
+
+def write_cached(cache_path, result):
+    if not cache_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f, default=str)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not cache analysis at {cache_path}: {e}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Analyze Excel file structure')
     parser.add_argument('--file', required=True, help='Path to Excel file')
+    parser.add_argument('--mode', choices=ANALYZE_MODES, default="full",
+                        help='full: every row; header: columns and row count; preview: one page of rows')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='First data row of the preview page')
+    parser.add_argument('--limit', type=int, default=DEFAULT_PREVIEW_LIMIT,
+                        help='Rows in the preview page')
     args = parser.parse_args()
 
-    result = analyze_file(args.file)
+    result = analyze_file(args.file, args.mode, args.offset, args.limit)
 
     # Make sure logging doesn't interfere with JSON output
     logging.getLogger().handlers = []  # Remove all handlers
 
     # Print clean JSON only to stdout
-    print(json.dumps(result))
+    print(json.dumps(result, default=str))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,146 @@
+import os
+import sys
+import random
+import resource
+import subprocess
+
+# ============================
+# 🔹 Shared Benchmark Helpers
+# ============================
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PROFESSOR_DIR = os.path.join(PROJECT_ROOT, "uploads", "prof_sean")
+
+
+def use_professor_dir(professor_dir=DEFAULT_PROFESSOR_DIR):
+    """Make a professor's Python scripts importable, as runPythonInCondaEnv does."""
+    professor_dir = os.path.abspath(professor_dir)
+    if professor_dir not in sys.path:
+        sys.path.insert(0, professor_dir)
+    return professor_dir
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(values, digits=4):
+    """Mean, p50, p95, p99 and max of a list of seconds."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), digits),
+        "p50": round(percentile(values, 0.50), digits),
+        "p95": round(percentile(values, 0.95), digits),
+        "p99": round(percentile(values, 0.99), digits),
+        "max": round(max(values), digits),
+    }
+
+
+def synthetic_essay(index, words=250):
+    """A deterministic essay-like text that differs per index."""
+    vocabulary = ["segmentation", "targeting", "differentiation", "positioning",
+                  "customers", "value", "market", "strategy", "company", "segment",
+                  "competitive", "advantage", "needs", "brand", "offer", "price"]
+    body = " ".join(vocabulary[(index * 7 + i * 3) % len(vocabulary)]
+                    for i in range(words))
+    return f"Essay {index}: The four steps are segmentation, targeting, differentiation and positioning. {body}."
+
+
+def write_essay_workbook(path, count, words=250):
+    """Write a grading input like the uploads: student_id and response columns."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["student_id", "response"])
+    for index in range(count):
+        sheet.append([f"S{index:05d}", synthetic_essay(index, words)])
+    workbook.save(path)
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    """Short commit hash of the checkout, stored with results for comparison."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================
+# 🔹 Synthetic Course Material
+# ============================
+
+TOPICS = ["market segmentation", "targeting", "differentiation", "positioning",
+          "customer value", "brand equity", "pricing strategy", "distribution channels",
+          "consumer behavior", "competitive advantage", "product life cycle",
+          "integrated marketing communications"]
+VERBS = ["shapes", "depends on", "is measured by", "drives", "constrains",
+         "is evaluated against", "supports", "reflects"]
+
+
+def synthetic_page_text(page, lines=40):
+    """Deterministic lecture-note text for one page (~90 characters per line)."""
+    rng = random.Random(page)
+    text = []
+    for _ in range(lines):
+        first, second = rng.sample(TOPICS, 2)
+        text.append(f"In chapter {page // 10 + 1}, {first} {rng.choice(VERBS)} "
+                    f"{second} for firm {rng.randint(1, 500)} in market {rng.randint(1, 50)}.")
+    return text
+
+
+def _pdf_string(text):
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def write_synthetic_pdf(path, first_page, page_count):
+    """Write a text PDF of `page_count` pages with synthetic_page_text content.
+
+    A minimal hand-built file (one Helvetica font, one content stream per
+    page) so no PDF library is needed to make benchmark corpora.
+    """
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for offset in range(page_count):
+        page_id, content_id = 4 + offset * 2, 5 + offset * 2
+        lines = synthetic_page_text(first_page + offset)
+        stream = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(
+            f"{_pdf_string(line)} '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects[content_id] = (b"<< /Length %d >>\nstream\n" % len(stream)
+                               + stream + b"\nendstream")
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), page_count)
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(data)
+        data += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref = len(data)
+    count = max(objects) + 1
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % count
+    data += b"".join(b"%010d 00000 n \n" % offsets[number] for number in range(1, count))
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
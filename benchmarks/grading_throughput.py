@@ -0,0 +1,205 @@
+import os
+import sys
+import shutil
+import json
+import time
+import logging
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+from common import use_professor_dir, summarize, write_essay_workbook, peak_rss_mb, git_revision
+import stub_llm_server
+
+# ============================
+# 🔹 Grading Throughput Benchmark
+# ============================
+# Runs script.main() in this process on a synthetic workbook and reports
+# essays/sec, per-essay latency percentiles, LLM calls, retries and peak
+# RSS as one JSON object. The stub backend runs in its own process so its
+# memory and threads aren't counted against the pipeline. Results can be
+# appended to a JSONL file (--results) to compare runs over time.
+
+
+def start_stub(args):
+    """Start stub_llm_server.py in a subprocess; return (process, generate URL)."""
+    stub_args = [
+        "--port", "0",
+        "--prefill-ms-per-kchar", str(args.prefill_ms_per_kchar),
+        "--decode-ms-per-token", str(args.decode_ms_per_token),
+        "--reply-tokens", str(args.reply_tokens),
+        "--filler-tokens", str(args.filler_tokens),
+        "--latency", args.latency,
+        "--latency-sigma", str(args.latency_sigma),
+        "--failure-rate", str(args.failure_rate),
+        "--malformed-rate", str(args.malformed_rate),
+        "--prompt-cache-slots", str(args.prompt_cache_slots),
+    ]
+    if args.seed is not None:
+        stub_args += ["--seed", str(args.seed)]
+    process = subprocess.Popen(
+        [sys.executable, stub_llm_server.__file__, *stub_args],
+        stdout=subprocess.PIPE, text=True)
+    ready = json.loads(process.stdout.readline())
+    return process, f"http://127.0.0.1:{ready['port']}/api/generate"
+
+
+def fetch_stub_stats(url):
+    stats_url = url.replace("/api/generate", "/stats")
+    with urllib.request.urlopen(stats_url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def script_arguments(args, input_path, output_dir):
+    """The CLI a grading job would be started with."""
+    argv = ["script.py", "--file", input_path, "--output-dir", output_dir,
+            "--model", args.model, "--workers", str(args.workers),
+            "--agent-concurrency", str(args.agent_concurrency),
+            "--strategy", args.strategy, "--output-format", args.output_format,
+            "--job-id", "benchmark"]
+    if args.stream:
+        argv.append("--stream")
+    if args.professor:
+        argv += ["--professor", args.professor, "--projectRoot", args.project_root]
+    return argv
+
+
+def run_benchmark(args, url):
+    work_dir = tempfile.mkdtemp(prefix="grading-bench-")
+    input_path = write_essay_workbook(
+        os.path.join(work_dir, "essays.xlsx"), args.essays, args.words)
+
+    # script.py reads these at import time; its log file lands in work_dir
+    os.environ["LLM_API_URL"] = url
+    os.environ["LLM_CACHE"] = "1" if args.use_cache else "0"
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        return grade_workbook(args, input_path, work_dir)
+    finally:
+        os.chdir(cwd)
+        if not args.keep_outputs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def grade_workbook(args, input_path, work_dir):
+    import script
+    import llm_client
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    # Time each essay through the same function grade_file calls
+    latencies = []
+    grade_response = script.grade_response
+
+    def timed_grade_response(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return grade_response(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    script.grade_response = timed_grade_response
+
+    llm_client.reset_stats()
+    sys.argv = script_arguments(args, input_path, os.path.join(work_dir, "outputs"))
+    start = time.perf_counter()
+    script.main()
+    elapsed = time.perf_counter() - start
+
+    stats = llm_client.get_stats()
+    with open(os.path.join(work_dir, "outputs", "benchmark.status")) as f:
+        status = json.load(f)
+    return {
+        "essays": args.essays,
+        "graded": status.get("completed", 0),
+        "elapsed_s": round(elapsed, 3),
+        "essays_per_sec": round(args.essays / elapsed, 3) if elapsed else None,
+        "essay_latency_s": summarize(latencies),
+        "llm": {
+            "calls": stats["calls"],
+            "failures": stats["failures"],
+            "transport_retries": stats["transport_retries"],
+            "output_retries": stats["output_retries"],
+            "cache_hits": stats["cache_hits"],
+            "per_model": stats["per_model"],
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "work_dir": work_dir if args.keep_outputs else None,
+    }
+
+# ============================
+# 🔹 CLI Handling
+# ============================
+
+
+def parse_arguments():
+    """Parses command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="End-to-end grading throughput against a stub or real backend")
+    parser.add_argument("--url", help="Backend /api/generate URL (default: start the stub)")
+    parser.add_argument("--essays", type=int, default=50)
+    parser.add_argument("--words", type=int, default=250, help="Words per synthetic essay")
+    parser.add_argument("--model", default="llama3.1:latest")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--agent-concurrency", type=int, default=1)
+    parser.add_argument("--strategy", default="per-agent")
+    parser.add_argument("--output-format", default="schema")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--professor", help="Use this professor's FAISS index for RAG")
+    parser.add_argument("--project-root", default=os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    parser.add_argument("--professor-dir", help="Directory holding script.py")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Turn the LLM reply cache on (off by default)")
+    parser.add_argument("--label", help="Free-form name stored with the result")
+    parser.add_argument("--results", help="Append the result as one JSON line to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep script.py's INFO logs")
+    parser.add_argument("--keep-outputs", action="store_true",
+                        help="Keep the synthetic workbook, graded output and log")
+    stub_llm_server.add_stub_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    use_professor_dir(*([args.professor_dir] if args.professor_dir else []))
+    # run_benchmark changes directory; keep user paths pointing where they were
+    args.project_root = os.path.abspath(args.project_root)
+    if args.results:
+        args.results = os.path.abspath(args.results)
+
+    stub = None
+    url = args.url
+    if not url:
+        stub, url = start_stub(args)
+
+    try:
+        result = run_benchmark(args, url)
+        if stub:
+            result["stub"] = fetch_stub_stats(url)
+    finally:
+        if stub:
+            stub.terminate()
+            stub.wait()
+
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ("results", "label", "verbose", "keep_outputs")}
+    report = {
+        "benchmark": "grading_throughput",
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "backend": "stub" if stub else url,
+        "settings": settings,
+        **result,
+    }
+    print(json.dumps(report, indent=2))
+    if args.results:
+        with open(args.results, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
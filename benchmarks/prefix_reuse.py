@@ -0,0 +1,132 @@
+import json
+import time
+import argparse
+import http.client
+from urllib.parse import urlsplit
+
+from common import use_professor_dir, summarize, synthetic_essay
+import stub_llm_server
+
+# ============================
+# 🔹 Prefix Reuse Benchmark
+# ============================
+# Measures time-to-first-token for the grading prompts with and without
+# prefix warming. Prompts are built by script.build_prompt and payloads by
+# script.build_payload, so this exercises the same code as a grading job;
+# only the request is streamed so the first token can be timed. How much
+# the backend's prompt cache saves depends on its slot count; with the stub
+# that is --prompt-cache-slots (0 = no prompt cache).
+
+
+def stream_ttft(url, payload):
+    """POST a streaming request and return (time to first token, total time)."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+    body = json.dumps({**payload, "stream": True})
+    start = time.perf_counter()
+    first_token = None
+    try:
+        connection.request("POST", parts.path, body,
+                           {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        for line in response:
+            message = json.loads(line)
+            if first_token is None and message.get("response"):
+                first_token = time.perf_counter() - start
+            if message.get("done"):
+                break
+    finally:
+        connection.close()
+    total = time.perf_counter() - start
+    return (first_token if first_token is not None else total), total
+
+
+def run_mode(script, mode, essays, rag_context, model):
+    """Grade-shaped requests for every essay and agent under one reuse mode."""
+    script.PREFIX_REUSE = mode
+    script._primed_prefixes.clear()
+    stub_llm_server._prompt_slots.clear()
+
+    # Priming is a one-off per prefix; time it separately from the essays
+    prime_start = time.perf_counter()
+    for template in script.AGENT_PROMPTS:
+        script.prime_prefix(script.render_prefix(template), model)
+    prime_seconds = time.perf_counter() - prime_start
+
+    ttfts, totals, prompt_chars = [], [], 0
+    for essay in essays:
+        for template in script.AGENT_PROMPTS:
+            prefix, prompt = script.build_prompt(template, essay, rag_context)
+            payload = script.build_payload(prompt, model=model, prefix=prefix)
+            prompt_chars += len(payload["prompt"])
+            ttft, total = stream_ttft(script.API_URL, payload)
+            ttfts.append(ttft)
+            totals.append(total)
+
+    return {
+        "mode": mode,
+        "primed": mode == "warm",
+        "requests": len(ttfts),
+        "prompt_chars_sent": prompt_chars,
+        "prime_s": round(prime_seconds, 4),
+        "ttft_s": summarize(ttfts),
+        "total_s": summarize(totals),
+    }
+
+# ============================
+# 🔹 CLI Handling
+# ============================
+
+
+def parse_arguments():
+    """Parses command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Time-to-first-token with and without prompt prefix reuse")
+    parser.add_argument("--url", help="Backend /api/generate URL (default: start the stub)")
+    parser.add_argument("--model", default="llama3.1:latest")
+    parser.add_argument("--essays", type=int, default=10)
+    parser.add_argument("--context-chars", type=int, default=2400,
+                        help="Size of the synthetic RAG context per essay")
+    parser.add_argument("--professor-dir", help="Directory holding script.py")
+    parser.add_argument("--prefill-ms-per-kchar", type=float, default=40.0,
+                        help="Stub prefill cost (ignored with --url)")
+    parser.add_argument("--prompt-cache-slots", type=int, default=4,
+                        help="Stub prompt-cache slots per model (ignored with --url)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    use_professor_dir(*([args.professor_dir] if args.professor_dir else []))
+    import script
+
+    server = None
+    if args.url:
+        script.API_URL = args.url
+    else:
+        server = stub_llm_server.start_server(stub_llm_server.make_settings(
+            prefill_ms_per_kchar=args.prefill_ms_per_kchar,
+            prompt_cache_slots=args.prompt_cache_slots))
+        script.API_URL = f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+
+    essays = [synthetic_essay(i) for i in range(args.essays)]
+    rag_context = ("Course material excerpt. " * 200)[:args.context_chars]
+
+    try:
+        results = [run_mode(script, mode, essays, rag_context, args.model)
+                   for mode in script.PREFIX_REUSE_MODES]
+    finally:
+        if server:
+            server.shutdown()
+
+    baseline, reused = results[0]["ttft_s"], results[-1]["ttft_s"]
+    print(json.dumps({
+        "backend": "stub" if server else args.url,
+        "essays": args.essays,
+        "results": results,
+        "ttft_mean_speedup": round(baseline["mean"] / reused["mean"], 2) if reused.get("mean") else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import argparse
+import tempfile
+
+from common import use_professor_dir, summarize, synthetic_essay, write_synthetic_pdf, git_revision
+
+# ============================
+# 🔹 Retrieval & Indexing Benchmark
+# ============================
+# Builds synthetic PDF corpora of increasing size and times each ingestion
+# stage through rag_pipeline's own functions: extraction (iter_pages),
+# splitting (iter_chunks), then embedding and index build together through
+# update_faiss_index. The two are separated with the pipeline's encode-time
+# counters. It then measures the on-disk index, a cold load, and single and
+# batched retrieve_relevant_text latency, using essays as queries like a
+# grading job does, and the index's recall@k against exact search.
+#
+# --embedding-model takes any HuggingFace model (e.g. a small local
+# sentence-transformers one) or "hash:<dim>", a deterministic hashed
+# bag-of-words embedder that needs no model download or GPU.
+
+
+class HashEmbeddings:
+    """Signed feature hashing of lowercase words into `dimension` floats, L2-normalized."""
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        import numpy as np
+
+        vector = np.zeros(self.dimension, dtype="float32")
+        for word in text.lower().split():
+            digest = zlib.crc32(word.encode("utf-8"))
+            vector[digest % self.dimension] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def hash_embeddings(model_name):
+    _, _, dimension = model_name.partition(":")
+    return HashEmbeddings(int(dimension or 384))
+
+
+def write_corpus(directory, pages, pages_per_file):
+    """Split `pages` synthetic pages across PDFs of at most `pages_per_file`."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for first_page in range(0, pages, pages_per_file):
+        count = min(pages_per_file, pages - first_page)
+        path = os.path.join(directory, f"material-{first_page:05d}.pdf")
+        paths.append(write_synthetic_pdf(path, first_page, count))
+    return paths
+
+
+def encode_seconds(rag_pipeline, model_name):
+    return rag_pipeline.get_embedding_stats().get(model_name, {}).get("encode_seconds", 0.0)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_size(rag_pipeline, work_dir, pages, args):
+    """Ingest a corpus of `pages` pages and query it; return one result row."""
+    corpus_dir = os.path.join(work_dir, f"corpus-{pages}")
+    indices_path = os.path.join(work_dir, f"indices-{pages}", "faiss_index.faiss")
+    files = write_corpus(corpus_dir, pages, args.pages_per_file)
+
+    extracted, extract_s = timed(lambda: {
+        path: list(rag_pipeline.iter_pages(path, args.extract_workers)) for path in files})
+    chunked, split_s = timed(lambda: {
+        path: list(rag_pipeline.iter_chunks(file_pages)) for path, file_pages in extracted.items()})
+    documents = [{"source": os.path.basename(path), "sha256": rag_pipeline.file_sha256(path),
+                  "chunks": chunks} for path, chunks in chunked.items()]
+    chunk_count = sum(len(chunks) for chunks in chunked.values())
+
+    encoded_before = encode_seconds(rag_pipeline, args.embedding_model)
+    summary, build_s = timed(rag_pipeline.update_faiss_index, indices_path, add=documents,
+                             rebuild=True, index_type=args.index_type)
+    embed_s = encode_seconds(rag_pipeline, args.embedding_model) - encoded_before
+
+    paths = rag_pipeline.get_store_paths(indices_path)
+    index_bytes = sum(os.path.getsize(paths[name]) for name in ("index", "chunks", "meta", "manifest"))
+
+    rag_pipeline.invalidate_index_cache(indices_path)
+    _, load_s = timed(rag_pipeline.load_faiss_index, indices_path)
+    recall = rag_pipeline.check_index_recall(indices_path, args.k, args.recall_queries)
+
+    queries = [synthetic_essay(i, args.query_words) for i in range(args.queries)]
+    single = [timed(rag_pipeline.retrieve_relevant_text, query, indices_path, args.k)[1]
+              for query in queries]
+    batches = [queries[i:i + args.batch_size] for i in range(0, len(queries), args.batch_size)]
+    batched = [timed(rag_pipeline.retrieve_relevant_text_batch, batch, indices_path, args.k)[1]
+               for batch in batches]
+
+    return {
+        "pages": pages,
+        "files": len(files),
+        "chunks": chunk_count,
+        "index_type": summary.get("index_type"),
+        "extract_s": round(extract_s, 3),
+        "extract_pages_per_s": round(pages / extract_s, 1) if extract_s else None,
+        "split_s": round(split_s, 3),
+        "embed_s": round(embed_s, 3),
+        "embed_chunks_per_s": round(chunk_count / embed_s, 1) if embed_s else None,
+        "index_build_s": round(max(build_s - embed_s, 0.0), 3),
+        "index_bytes": index_bytes,
+        "index_load_s": round(load_s, 4),
+        "query_single_s": summarize(single),
+        "query_batch_s": summarize(batched),
+        "query_batch_per_query_s": round(sum(batched) / len(queries), 4) if queries else None,
+        "recall": recall,
+    }
+
+# ============================
+# 🔹 CLI Handling
+# ============================
+
+
+def parse_arguments():
+    """Parses command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Ingestion and retrieval timings for rag_pipeline.py on synthetic corpora")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="Corpus sizes to build, in pages")
+    parser.add_argument("--pages-per-file", type=int, default=100)
+    parser.add_argument("--embedding-model", default="hash:384",
+                        help='HuggingFace model name, or "hash:<dim>" for the offline stub')
+    parser.add_argument("--extract-workers", type=int, default=1,
+                        help="Page-extraction processes per file (iter_pages workers)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--query-words", type=int, default=250, help="Words per query essay")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-type", default="auto", choices=("auto", "flat", "ivf", "hnsw"))
+    parser.add_argument("--recall-queries", type=int, default=200,
+                        help="Stored vectors used as queries for the recall@k check")
+    parser.add_argument("--professor-dir", help="Directory holding rag_pipeline.py")
+    parser.add_argument("--label", help="Free-form name stored with the result")
+    parser.add_argument("--results", help="Append the result as one JSON line to this file")
+    parser.add_argument("--keep-outputs", action="store_true",
+                        help="Keep the generated corpora and indexes")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    use_professor_dir(*([args.professor_dir] if args.professor_dir else []))
+
+    # Read at import: new indexes use this model, and cached chunks/vectors
+    # would hide the costs being measured
+    os.environ["EMBEDDING_MODEL"] = args.embedding_model
+    os.environ["INGEST_CACHE"] = "0"
+    import rag_pipeline
+    rag_pipeline.register_embedding_provider("hash", hash_embeddings)
+
+    _, model_load_s = timed(rag_pipeline.get_embeddings, args.embedding_model)
+
+    work_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        results = [run_size(rag_pipeline, work_dir, pages, args) for pages in args.pages]
+    finally:
+        if not args.keep_outputs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "rag_retrieval",
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("results", "label", "keep_outputs")},
+        "model_load_s": round(model_load_s, 3),
+        "results": results,
+        "work_dir": work_dir if args.keep_outputs else None,
+    }
+    print(json.dumps(report, indent=2))
+    if args.results:
+        with open(os.path.abspath(args.results), "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# 🔹 Simulated Backend
+# ============================
+# A stand-in for the local /api/generate backend with a simple cost model:
+# prefill time grows with the prompt length, then tokens decode at a fixed
+# rate. Like llama.cpp/Ollama, each of `prompt_cache_slots` slots per model
+# keeps the last prompt it served, and a new prompt only pays prefill past
+# the longest prefix it shares with one of them. A request that passes back
+# a `context` from an earlier reply only pays for its new prompt text.
+# Replies are valid grading JSON, so script.py can run against it unchanged.
+# For throughput runs, latency can be drawn from a distribution and a share
+# of requests can fail (HTTP 503) or come back as malformed JSON.
+
+
+LATENCY_DISTRIBUTIONS = ("fixed", "lognormal", "exponential")
+
+
+def make_settings(prefill_ms_per_kchar=40.0, decode_ms_per_token=4.0, reply_tokens=60,
+                  filler_tokens=0, latency="fixed", latency_sigma=0.5,
+                  failure_rate=0.0, malformed_rate=0.0, seed=None, prompt_cache_slots=4):
+    if latency not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution: {latency}")
+    return {
+        "prefill_ms_per_kchar": prefill_ms_per_kchar,
+        "decode_ms_per_token": decode_ms_per_token,
+        "reply_tokens": reply_tokens,
+        # Chatter some models keep generating after the closing brace
+        "filler_tokens": filler_tokens,
+        # Each request's time is the cost model scaled by a draw with mean 1
+        "latency": latency,
+        "latency_sigma": latency_sigma,
+        "failure_rate": failure_rate,
+        "malformed_rate": malformed_rate,
+        "prompt_cache_slots": prompt_cache_slots,
+        "random": random.Random(seed),
+    }
+
+
+def latency_factor(settings):
+    """A multiplier with mean 1 drawn from the configured distribution."""
+    rng = settings["random"]
+    if settings["latency"] == "lognormal":
+        sigma = settings["latency_sigma"]
+        return rng.lognormvariate(-sigma * sigma / 2, sigma)
+    if settings["latency"] == "exponential":
+        return rng.expovariate(1.0)
+    return 1.0
+
+
+MALFORMED_REPLIES = [
+    "I'm sorry, but I can't provide a score for this essay.",
+    "Score: 20/30. The essay covers the main steps but lacks detail.",
+    '{"score": , "feedback": }',
+]
+
+
+FILLER = "\n\nI hope this feedback helps the student improve their response. "
+
+
+_contexts = {}  # context id -> number of prompt chars it covers
+_prompt_slots = {}  # model -> last prompts served, most recent last
+_contexts_lock = threading.Lock()
+
+# What the server has done since it started, served at GET /stats
+_served = {"requests": 0, "failures": 0, "malformed": 0}
+
+
+def count_served(key):
+    with _contexts_lock:
+        _served[key] += 1
+
+
+def get_served():
+    with _contexts_lock:
+        return dict(_served)
+
+
+def register_context(chars):
+    with _contexts_lock:
+        context_id = len(_contexts) + 1
+        _contexts[context_id] = chars
+        return [context_id]
+
+
+def cached_chars(context):
+    """Characters already prefilled for a context returned by this server."""
+    if not context:
+        return 0
+    with _contexts_lock:
+        return _contexts.get(context[0], 0)
+
+
+def prompt_cache_hit(model, prompt, slots):
+    """Characters of `prompt` already prefilled in one of the model's slots.
+
+    The matching slot (or the least recently used one) now holds `prompt`.
+    """
+    with _contexts_lock:
+        recent = _prompt_slots.setdefault(model, deque())
+        best, hit = None, 0
+        for cached in recent:
+            shared = len(os.path.commonprefix([cached, prompt]))
+            if shared > hit:
+                best, hit = cached, shared
+        if best is not None:
+            recent.remove(best)
+        recent.append(prompt)
+        while len(recent) > slots:
+            recent.popleft()
+        return hit
+
+
+def fake_reply(prompt):
+    """Return grading JSON shaped like the prompt asks for."""
+    feedback = "You identified the main steps; explain how each one builds on the last."
+    if '"identification"' in prompt:
+        return json.dumps({
+            "identification": {"score": random.randint(15, 30), "feedback": feedback},
+            "explanation": {"score": random.randint(15, 30), "feedback": feedback},
+            "goals": {"score": random.randint(15, 30), "feedback": feedback},
+            "clarity": {"score": random.randint(5, 10), "feedback": feedback},
+        })
+    maximum = 10 if "<total score 10>" in prompt else 30
+    return json.dumps({"score": random.randint(maximum // 2, maximum), "feedback": feedback})
+
+
+def make_handler(settings):
+    """Build a request handler bound to one set of timing settings."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self.send_json(200, get_served())
+            self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                return self.send_json(404, {"error": "not found"})
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            count_served("requests")
+
+            with _contexts_lock:
+                roll = settings["random"].random()
+                factor = latency_factor(settings)
+            if roll < settings["failure_rate"]:
+                count_served("failures")
+                return self.send_json(503, {"error": "simulated overload"})
+
+            prompt = payload.get("prompt", "")
+            reused = cached_chars(payload.get("context"))
+            total_chars = reused + len(prompt)
+            cached = 0 if reused else prompt_cache_hit(
+                payload.get("model"), prompt, settings["prompt_cache_slots"])
+            prefill = settings["prefill_ms_per_kchar"] * (len(prompt) - cached) / 1000 * factor
+            tokens = min(settings["reply_tokens"],
+                         int(payload.get("max_tokens") or settings["reply_tokens"]))
+            decode = settings["decode_ms_per_token"] * tokens * factor
+
+            reply = fake_reply(prompt) if tokens > 1 else ""
+            if reply and roll < settings["failure_rate"] + settings["malformed_rate"]:
+                count_served("malformed")
+                with _contexts_lock:
+                    reply = settings["random"].choice(MALFORMED_REPLIES)
+            filler = settings["filler_tokens"] if tokens > 1 else 0
+            if filler:
+                reply += (FILLER * (filler // 10 + 1))[:filler * 4]
+                decode += settings["decode_ms_per_token"] * filler
+            done = {"done": True, "context": register_context(total_chars),
+                    "prompt_eval_count": len(prompt) // 4, "eval_count": tokens}
+
+            if not payload.get("stream", True):
+                time.sleep((prefill + decode) / 1000)
+                return self.send_json(200, {"response": reply, **done})
+
+            # NDJSON stream: the first token arrives right after prefill
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(prefill / 1000)
+            pieces = [reply[i:i + 8] for i in range(0, len(reply), 8)] or [""]
+            try:
+                for piece in pieces:
+                    self.write_chunk({"response": piece, "done": False})
+                    time.sleep(decode / len(pieces) / 1000)
+                self.write_chunk({"response": "", **done})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading early (e.g. its JSON object closed)
+                self.close_connection = True
+
+        def write_chunk(self, message):
+            data = (json.dumps(message) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """Start the stub in a background thread and return the server."""
+    server = ThreadingHTTPServer((host, port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ============================
+# 🔹 CLI Handling
+# ============================
+
+
+def parse_arguments():
+    """Parses command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Stub /api/generate server for grading benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    add_stub_arguments(parser)
+    return parser.parse_args()
+
+
+def add_stub_arguments(parser):
+    """Stub cost-model and fault options, shared with the benchmark runners."""
+    parser.add_argument("--prefill-ms-per-kchar", type=float, default=40.0,
+                        help="Simulated prefill cost per 1000 prompt characters")
+    parser.add_argument("--decode-ms-per-token", type=float, default=4.0,
+                        help="Simulated decode cost per generated token")
+    parser.add_argument("--reply-tokens", type=int, default=60,
+                        help="Tokens generated per reply (capped by max_tokens)")
+    parser.add_argument("--filler-tokens", type=int, default=0,
+                        help="Extra tokens generated after the JSON object")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="Distribution of the per-request latency multiplier (mean 1)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5,
+                        help="Spread of the lognormal latency distribution")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Share of requests answered with HTTP 503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Share of requests answered with unusable JSON")
+    parser.add_argument("--seed", type=int, help="Seed for latency and fault draws")
+    parser.add_argument("--prompt-cache-slots", type=int, default=4,
+                        help="Prompts per model whose prefill is cached (0 disables prompt caching)")
+
+
+def settings_from_args(args):
+    return make_settings(
+        args.prefill_ms_per_kchar, args.decode_ms_per_token, args.reply_tokens,
+        args.filler_tokens, args.latency, args.latency_sigma,
+        args.failure_rate, args.malformed_rate, args.seed, args.prompt_cache_slots)
+
+
+def main():
+    args = parse_arguments()
+    settings = settings_from_args(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(settings))
+    print(json.dumps({"ready": True, "port": server.server_address[1]}), flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,10 @@ const multer = require("multer");
 const path = require("path");
 const fs = require("fs");
 const logger = require("../utils/logger");
-const { runPythonInCondaEnv } = require("../utils/python-helpers");
+const {
+  runPythonInCondaEnv,
+  hasFaissIndex,
+} = require("../utils/python-helpers");
 const { verifyToken } = require("../utils/middleware");
 const config = require("../utils/config");
 
@@ -150,6 +153,7 @@ router.post(
           // Run Python script with the uploaded file path and professor username
           const pythonProcess = runPythonInCondaEnv(filePath, "rag_pipeline", {
             professorUsername: req.user.username,
+            projectRoot: config.paths.root,
           });
 
           // Create a promise to handle the Python process completion
@@ -271,8 +275,52 @@ router.post(
   }
 );
 
+// Remove a deleted material's vectors from the professor's FAISS index
+function removeFromIndex(professorUsername, filename) {
+  return new Promise((resolve) => {
+    const pythonProcess = runPythonInCondaEnv(null, "rag_pipeline", {
+      professorUsername,
+      projectRoot: config.paths.root,
+      remove: filename,
+    });
+
+    let scriptOutput = "";
+    pythonProcess.stdout.on("data", (data) => {
+      scriptOutput += data.toString().trim();
+    });
+
+    pythonProcess.on("close", (code) => {
+      if (code !== 0) {
+        logger.error(`Failed to remove ${filename} from index (code ${code})`);
+        return resolve(false);
+      }
+
+      // Exit code 0 with nothing removed means the name didn't match an
+      // indexed source, so its vectors are still being retrieved
+      let removed = [];
+      try {
+        const { stats = {} } = JSON.parse(scriptOutput);
+        removed = (stats.index && stats.index.removed) || [];
+      } catch (error) {
+        logger.error(`Unreadable output removing ${filename} from index`, {
+          output: scriptOutput,
+        });
+        return resolve(false);
+      }
+      if (removed.length === 0) {
+        logger.error(`${filename} was not found in the index`, {
+          output: scriptOutput,
+        });
+        return resolve(false);
+      }
+      logger.info(`Removed ${filename} from index`, { output: scriptOutput });
+      resolve(true);
+    });
+  });
+}
+
 // Delete a course material
-router.delete("/course-materials/:filename", (req, res) => {
+router.delete("/course-materials/:filename", async (req, res) => {
   try {
     const professorUsername = req.user.username;
     const filename = req.params.filename;
@@ -293,10 +341,12 @@ router.delete("/course-materials/:filename", (req, res) => {
     }
 
     fs.unlinkSync(filePath);
+    const indexUpdated = await removeFromIndex(professorUsername, filename);
 
     res.status(200).json({
       success: true,
       message: "Course material deleted successfully",
+      indexUpdated,
     });
   } catch (error) {
     logger.error("Error deleting course material", {
@@ -317,16 +367,7 @@ router.get("/rag-status", (req, res) => {
     const professorUsername = req.user.username;
 
     // Check if FAISS indices file exists for this specific professor
-    const indicesPath = path.join(
-      __dirname,
-      "..",
-      "uploads",
-      professorUsername,
-      "indices",
-      "faiss_index.pkl"
-    );
-
-    const faissExists = fs.existsSync(indicesPath);
+    const faissExists = hasFaissIndex(professorUsername);
 
     logger.info(
       `RAG status check for professor ${professorUsername}: ${
@@ -386,9 +427,10 @@ router.post("/reinitialize-rag", async (req, res) => {
     // Run Python script for RAG initialization
     const pythonProcess = runPythonInCondaEnv(
       materialsDir, // Pass the materials directory
-      "rag_initialize",
+      "rag_pipeline",
       {
         professorUsername: professorUsername,
+        projectRoot: config.paths.root,
         reinitialize: true,
       }
     );
@@ -423,6 +465,9 @@ router.post("/reinitialize-rag", async (req, res) => {
       try {
         // Parse the JSON output from the Python script
         const outputData = JSON.parse(scriptOutput);
+        logger.info("RAG pipeline reinitialized", {
+          stats: outputData.stats || {},
+        });
 
         res.status(200).json({
           success: true,
@@ -4,6 +4,8 @@ const multer = require("multer");
 const path = require("path");
 const fs = require("fs");
 const { runPythonInCondaEnv } = require("../utils/python-helpers");
+const { callWorker, markJobFailed } = require("../utils/python-worker");
+const config = require("../utils/config");
 const logger = require("../utils/logger");
 const { verifyToken } = require("../utils/middleware");
 
@@ -50,9 +52,81 @@ router.post("/upload-essays", upload.single("file"), (req, res) => {
   // For debugging, log the exact command being run
   console.log(`Analyzing file: ${filePath}`);
 
+  const sendAnalysis = (analysisResult) =>
+    res.status(200).json({
+      success: true,
+      fileInfo: {
+        name: req.file.originalname,
+        path: filePath,
+        rowCount: analysisResult.total_rows || 0,
+        hasResponseColumn: analysisResult.has_response || false,
+        columns: analysisResult.columns || [],
+        previewData: analysisResult.preview_data || [],
+        previewLimit: analysisResult.limit || 0,
+      },
+    });
+
+  // Only the first page of rows; the rest via /essays-preview
+  analyzeFile(
+    req.user.username,
+    filePath,
+    { mode: "preview", offset: 0, limit: config.analysis.previewRows },
+    res,
+    sendAnalysis
+  );
+});
+
+// Page through the rows of an uploaded essay file
+router.get("/essays-preview", (req, res) => {
+  const { filePath } = req.query;
+  const offset = Math.max(parseInt(req.query.offset || "0", 10) || 0, 0);
+  const limit = Math.min(
+    Math.max(parseInt(req.query.limit || "0", 10) || config.analysis.previewRows, 1),
+    500
+  );
+
+  // Only files from the requesting professor's essay uploads
+  const essaysDir = config.paths.getUploadsPath(req.user.username, "essays");
+  if (!filePath || !path.resolve(filePath).startsWith(essaysDir + path.sep)) {
+    return res
+      .status(400)
+      .json({ success: false, message: "Invalid file path" });
+  }
+
+  analyzeFile(
+    req.user.username,
+    filePath,
+    { mode: "preview", offset, limit },
+    res,
+    (analysisResult) =>
+      res.status(200).json({
+        success: !analysisResult.error,
+        rowCount: analysisResult.total_rows || 0,
+        columns: analysisResult.columns || [],
+        previewData: analysisResult.preview_data || [],
+        offset,
+        limit,
+        message: analysisResult.error || "",
+      })
+  );
+});
+
+// Prefer the warm worker; fall back to a one-off Python process
+function analyzeFile(username, filePath, options, res, sendAnalysis) {
+  callWorker(username, "/analyze", { file: filePath, ...options })
+    .then(sendAnalysis)
+    .catch((error) => {
+      logger.warn(`Worker analysis unavailable, spawning Python: ${error.message}`);
+      analyzeWithSubprocess(filePath, options, res, sendAnalysis);
+    });
+}
+
+// Analyze an uploaded file with a one-off Python process
+function analyzeWithSubprocess(filePath, options, res, sendAnalysis) {
   // Run Python script to analyze the file
   const analyzeProcess = runPythonInCondaEnv(null, "analyze_excel", {
     file: filePath,
+    ...options,
   });
 
   let output = "";
@@ -73,18 +147,7 @@ router.post("/upload-essays", upload.single("file"), (req, res) => {
     try {
       // Try to parse the JSON output
       const analysisResult = JSON.parse(output.trim());
-
-      return res.status(200).json({
-        success: true,
-        fileInfo: {
-          name: req.file.originalname,
-          path: filePath,
-          rowCount: analysisResult.total_rows || 0,
-          hasResponseColumn: analysisResult.has_response || false,
-          columns: analysisResult.columns || [],
-          previewData: analysisResult.preview_data || [],
-        },
-      });
+      return sendAnalysis(analysisResult);
     } catch (error) {
       console.error("Parse error:", error.message);
       return res.status(500).json({
@@ -93,11 +156,11 @@ router.post("/upload-essays", upload.single("file"), (req, res) => {
       });
     }
   });
-});
+}
 
 // Start grading process
 router.post("/grade-essays", express.json(), (req, res) => {
-  const { filePath, model, professorUsername } = req.body;
+  const { filePath, model, professorUsername, strategy } = req.body;
   console.log(filePath);
   if (!filePath) {
     return res
@@ -120,46 +183,159 @@ router.post("/grade-essays", express.json(), (req, res) => {
   // Respond immediately
   res.status(202).json({ success: true, jobId });
 
-  // Run grading script in background with essential parameters
-  // Output directory will be handled inside runPythonInCondaEnv
-  const gradingProcess = runPythonInCondaEnv(filePath, "script", {
-    professor: username,
-    model: model || "llama3.1:latest",
-    "job-id": jobId,
-  });
+  startGradingJob(
+    username,
+    jobId,
+    {
+      file: filePath,
+      model: model || "llama3.1:latest",
+      jobId,
+      workers: config.grading.workers,
+      strategy: strategy || config.grading.strategy,
+    },
+    filePath,
+    {
+      model: model || "llama3.1:latest",
+      "job-id": jobId,
+      strategy: strategy || config.grading.strategy,
+    }
+  );
+});
 
-  // Log output (but don't wait for completion)
-  gradingProcess.stdout.on("data", (data) => {
-    logger.info(`Grading output [${username}]: ${data}`);
-  });
+// job-<username>-<timestamp>, as created by /grade-essays
+const RESUMABLE_JOB_ID = /^job-[^-/\\.]+-\d+$/;
 
-  gradingProcess.stderr.on("data", (data) => {
-    logger.error(`Grading error [${username}]: ${data}`);
-  });
+// Resume an interrupted grading job from its journal
+router.post("/resume-grading/:jobId", (req, res) => {
+  const { jobId } = req.params;
+  const username = req.user.username;
+
+  // The job ID becomes a file name, and resuming runs a job as its owner
+  if (!RESUMABLE_JOB_ID.test(jobId)) {
+    return res
+      .status(400)
+      .json({ success: false, message: "Invalid job ID" });
+  }
+  if (jobUsername(jobId) !== username) {
+    return res
+      .status(403)
+      .json({ success: false, message: "Job belongs to another user" });
+  }
+
+  const journalPath = path.join(
+    config.paths.getOutputsPath(username),
+    `${jobId}.journal.jsonl`
+  );
+  if (!fs.existsSync(journalPath)) {
+    return res
+      .status(404)
+      .json({ success: false, message: "No journal found for this job" });
+  }
+
+  // A running job would race the resumed run on its journal and workbook.
+  // The job lock in job_journal.py enforces this; checking the status here
+  // lets the caller know. force=true skips the check for a job whose
+  // process died without updating its status.
+  const statusPath = path.join(
+    config.paths.getOutputsPath(username),
+    `${jobId}.status`
+  );
+  if (req.query.force !== "true" && fs.existsSync(statusPath)) {
+    try {
+      const status = JSON.parse(fs.readFileSync(statusPath, "utf8"));
+      if (status.status === "processing") {
+        return res.status(409).json({
+          success: false,
+          message: "Job is still processing; it can be resumed once it stops",
+        });
+      }
+    } catch (error) {
+      logger.warn(`Unreadable status for ${jobId}: ${error.message}`);
+    }
+  }
+
+  res.status(202).json({ success: true, jobId });
+
+  // Input file, model and strategy come from the journal
+  startGradingJob(
+    username,
+    jobId,
+    { jobId, resume: true, workers: config.grading.workers },
+    null,
+    { resume: jobId }
+  );
 });
 
+// Professor a job belongs to (job IDs look like job-username-timestamp)
+function jobUsername(jobId, fallbackUsername) {
+  const match = jobId.match(/^job-([^-]+)-/);
+  return match ? match[1] : fallbackUsername;
+}
+
+// Hand a job to the warm worker; fall back to a one-off Python process
+function startGradingJob(username, jobId, workerBody, filePath, scriptOptions) {
+  const outputDir = config.paths.getOutputsPath(username);
+
+  callWorker(username, "/grade", { ...workerBody, outputDir })
+    .then(() => logger.info(`Grading job ${jobId} started on worker`))
+    .catch((error) => {
+      if (error.status === 409) {
+        // The job is still running; a second run would race on its journal
+        logger.warn(`Grading job ${jobId} not started: ${error.message}`);
+        return;
+      }
+      logger.warn(`Worker grading unavailable, spawning Python: ${error.message}`);
+
+      // Run grading script in background with essential parameters
+      const gradingProcess = runPythonInCondaEnv(filePath, "script", {
+        professor: username,
+        ...scriptOptions,
+        "output-dir": outputDir,
+        projectRoot: config.paths.root,
+        workers: config.grading.workers,
+      });
+
+      // Log output (but don't wait for completion)
+      gradingProcess.stdout.on("data", (data) => {
+        logger.info(`Grading output [${username}]: ${data}`);
+      });
+
+      gradingProcess.stderr.on("data", (data) => {
+        logger.error(`Grading error [${username}]: ${data}`);
+      });
+
+      // A crash (or kill) leaves no chance for script.py to record the error.
+      // Exit code 75 means the job was already running and owns its status.
+      gradingProcess.on("exit", (code, signal) => {
+        if (code === 0 || code === 75) return;
+        try {
+          markJobFailed(
+            path.join(outputDir, `${jobId}.status`),
+            `Grading process exited (${signal || `code ${code}`})`
+          );
+        } catch (error) {
+          logger.error(`Could not update status of ${jobId}: ${error.message}`);
+        }
+      });
+    });
+}
+
 // Check grading status
 router.get("/grading-status/:jobId", (req, res) => {
   const { jobId } = req.params;
 
-  // Extract professor username from jobId (assuming format job-username-timestamp)
-  const match = jobId.match(/^job-([^-]+)-/);
-  const professorUsername = match ? match[1] : null;
-
-  // If no professor username in jobId, use authenticated user
-  const username = professorUsername || req.user.username;
+  // Professor from the jobId, or the authenticated user
+  const username = jobUsername(jobId, req.user.username);
 
   // Determine correct status file path
   const statusPath = path.join(
-    __dirname,
-    "..",
-    "outputs",
-    username,
+    config.paths.getOutputsPath(username),
     `${jobId}.status`
   );
 
   if (fs.existsSync(statusPath)) {
     try {
+      // script.py replaces the status file atomically, so this never sees a partial write
       const statusContent = fs.readFileSync(statusPath, "utf8");
       const status = JSON.parse(statusContent);
 
@@ -174,6 +350,15 @@ router.get("/grading-status/:jobId", (req, res) => {
         rowCount: status.rowCount || 0,
         completed: status.completed || 0,
         message: status.message || "",
+        resumable: status.resumable || false,
+        // Throughput and ETA, so long jobs show more than a percentage
+        essaysPerSec: status.essaysPerSec || 0,
+        latencyMeanSeconds: status.latencyMeanSeconds ?? null,
+        latencyP95Seconds: status.latencyP95Seconds ?? null,
+        retries: status.retries || { transport: 0, output: 0 },
+        etaSeconds: status.etaSeconds ?? null,
+        elapsedSeconds: status.elapsedSeconds || 0,
+        updatedAt: status.updatedAt || null,
       });
     } catch (error) {
       logger.error(`Error reading status file: ${error.message}`);
@@ -206,10 +391,7 @@ router.get("/download/:username/:jobId", (req, res) => {
   }
 
   const outputPath = path.join(
-    __dirname,
-    "..",
-    "outputs",
-    username,
+    config.paths.getOutputsPath(username),
     `graded_responses_${jobId}.xlsx`
   );
 
@@ -9,7 +9,11 @@ const {
   updateAgentGradingDistribution,
 } = require("../utils/rubricHandler");
 const config = require("../utils/config");
-const { runPythonInCondaEnv } = require("../utils/python-helpers");
+const {
+  runPythonInCondaEnv,
+  hasFaissIndex,
+} = require("../utils/python-helpers");
+const { callWorker } = require("../utils/python-worker");
 
 const router = express.Router();
 
@@ -71,12 +75,7 @@ router.post("/generate-sample-rubrics", async (req, res) => {
     logger.info(`Using model: ${model}`);
 
     // Check if RAG pipeline is initialized
-    const indicesPath = path.join(
-      config.paths.getUploadsPath(professorUsername, "indices"),
-      "faiss_index.pkl"
-    );
-
-    if (!fs.existsSync(indicesPath)) {
+    if (!hasFaissIndex(professorUsername)) {
       return res.status(400).json({
         success: false,
         message:
@@ -89,6 +88,27 @@ router.post("/generate-sample-rubrics", async (req, res) => {
         ? question
         : question.text || JSON.stringify(question);
 
+    // Prefer the warm worker; fall back to a one-off Python process
+    try {
+      const outputData = await callWorker(
+        professorUsername,
+        "/generate-sample-rubrics",
+        { question: questionText, numSamples: 3, model }
+      );
+      if (outputData.success) {
+        return res.status(200).json({
+          success: true,
+          message: "Sample rubrics generated successfully",
+          sampleRubrics: outputData.sampleRubrics || [],
+        });
+      }
+      logger.warn(`Worker rubric generation failed: ${outputData.message}`);
+    } catch (error) {
+      logger.warn(
+        `Worker rubric generation unavailable, spawning Python: ${error.message}`
+      );
+    }
+
     // Run Python script to generate sample rubrics
     const pythonProcess = runPythonInCondaEnv(null, "generate_rubrics", {
       question: questionText,
@@ -14,6 +14,7 @@ const authRoutes = require("./routes/auth.routes");
 const questionRoutes = require("./routes/questions.routes");
 require("dotenv").config();
 const config = require("./utils/config");
+const { stopWorkers } = require("./utils/python-worker");
 
 // Initialize express app
 const app = express();
@@ -141,6 +142,5 @@ function gracefulShutdown() {
   logger.info("Received shutdown signal, closing server gracefully");
 
   // Close any database connections or cleanup tasks here
-
-  process.exit(0);
+  stopWorkers().finally(() => process.exit(0));
 }
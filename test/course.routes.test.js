@@ -0,0 +1,77 @@
+// test/course.routes.test.js
+const test = require("node:test");
+const assert = require("node:assert");
+const fs = require("fs");
+const path = require("path");
+const {
+  silenceLogger,
+  fakeSpawn,
+  routeHandler,
+  fakeResponse,
+} = require("./helpers");
+
+const ROOT = path.join(__dirname, "..");
+const PROFESSOR = "prof_sean";
+const MATERIALS_DIR = path.join(ROOT, "uploads", PROFESSOR, "materials");
+
+// Sources the fake rag_pipeline run reports as removed for --remove
+let removedSources = [];
+
+silenceLogger();
+const calls = fakeSpawn(test.mock, (fake) => {
+  const stats = {
+    index: { removed: removedSources, removed_vectors: removedSources.length },
+  };
+  fake.stdout.emit("data", JSON.stringify({ success: true, stats }) + "\n");
+  fake.emit("exit", 0, null);
+  fake.emit("close", 0);
+});
+const router = require("../routes/course.routes");
+
+async function deleteMaterial(t, removed) {
+  removedSources = removed;
+  calls.length = 0;
+  const handler = routeHandler(router, "delete", "/course-materials/:filename");
+
+  const filename = "Week 1 notes; draft.txt";
+  fs.mkdirSync(MATERIALS_DIR, { recursive: true });
+  const filePath = path.join(MATERIALS_DIR, filename);
+  fs.writeFileSync(filePath, "lecture notes");
+  t.after(() => fs.rmSync(filePath, { force: true }));
+
+  const res = fakeResponse();
+  await handler(
+    { user: { username: PROFESSOR }, params: { filename }, headers: {} },
+    res
+  );
+  await res.done;
+  return { res, calls, filename, filePath };
+}
+
+test("deleting a material removes it from the professor's index", async (t) => {
+  const { res, calls, filename, filePath } = await deleteMaterial(t, [
+    "Week 1 notes; draft.txt",
+  ]);
+
+  assert.strictEqual(res.statusCode, 200);
+  assert.strictEqual(res.body.indexUpdated, true);
+  assert.strictEqual(fs.existsSync(filePath), false);
+
+  assert.strictEqual(calls.length, 1);
+  const [script, ...args] = calls[0].argv;
+  assert.strictEqual(
+    script,
+    path.join(ROOT, "uploads", PROFESSOR, "rag_pipeline.py")
+  );
+  // The filename reaches Python as one argument, without shell quoting
+  const removeAt = args.indexOf("--remove");
+  assert.notStrictEqual(removeAt, -1);
+  assert.strictEqual(args[removeAt + 1], filename);
+});
+
+test("a removal that matches no indexed source is reported", async (t) => {
+  const { res } = await deleteMaterial(t, []);
+
+  assert.strictEqual(res.statusCode, 200);
+  assert.strictEqual(res.body.indexUpdated, false);
+});
@@ -0,0 +1,36 @@
+// test/grading.routes.test.js
+const test = require("node:test");
+const assert = require("node:assert");
+const { silenceLogger, fakeSpawn, routeHandler, fakeResponse } = require("./helpers");
+
+silenceLogger();
+const calls = fakeSpawn(test.mock);
+const router = require("../routes/grading.routes");
+const resume = routeHandler(router, "post", "/resume-grading/:jobId");
+
+async function resumeJob(jobId, username) {
+  const res = fakeResponse();
+  resume({ user: { username }, params: { jobId }, query: {}, headers: {} }, res);
+  return res.done;
+}
+
+test("a job can only be resumed by its owner", async () => {
+  const res = await resumeJob("job-prof_sean-1712345678901", "prof_other");
+
+  assert.strictEqual(res.statusCode, 403);
+  assert.strictEqual(calls.length, 0);
+});
+
+test("job IDs that aren't job-<username>-<timestamp> are rejected", async () => {
+  for (const jobId of ["job-../../prof_sean-1", "job-prof_sean-1/../x", "x"]) {
+    const res = await resumeJob(jobId, "prof_sean");
+    assert.strictEqual(res.statusCode, 400, jobId);
+  }
+  assert.strictEqual(calls.length, 0);
+});
+
+test("an owner's job without a journal is not found", async () => {
+  const res = await resumeJob("job-prof_sean-1", "prof_sean");
+
+  assert.strictEqual(res.statusCode, 404);
+});
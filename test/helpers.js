@@ -0,0 +1,68 @@
+// test/helpers.js
+const path = require("path");
+const childProcess = require("child_process");
+const { EventEmitter } = require("events");
+
+// Keep test runs out of logs/ by swapping in a silent logger before any
+// module under test requires utils/logger
+function silenceLogger() {
+  const loggerPath = require.resolve(path.join(__dirname, "..", "utils", "logger"));
+  const silent = { info() {}, warn() {}, error() {}, debug() {} };
+  require.cache[loggerPath] = {
+    id: loggerPath,
+    filename: loggerPath,
+    loaded: true,
+    exports: silent,
+  };
+}
+
+/**
+ * Replace child_process.spawn with a fake that records each call. Must run
+ * before requiring utils/python-helpers, which destructures `spawn` at load
+ * time, so later calls in the same file reuse the first fake.
+ * @param {MockTracker} mock - node:test mock tracker (`t.mock` or `test.mock`)
+ * @param {Function} [onSpawn] - Called with (fakeProcess, pythonArgv)
+ * @returns {Array<{argv: string[], process: EventEmitter}>} - Recorded calls
+ */
+function fakeSpawn(mock, onSpawn = () => {}) {
+  const calls = [];
+  mock.method(childProcess, "spawn", (command, args) => {
+    const fake = new EventEmitter();
+    fake.stdout = new EventEmitter();
+    fake.stderr = new EventEmitter();
+    fake.kill = () => fake.emit("exit", null, "SIGTERM");
+    // runPythonInCondaEnv runs: bash -c <command> bash <script> ...args
+    const argv = args.slice(3);
+    calls.push({ command, argv, process: fake });
+    setImmediate(() => onSpawn(fake, argv));
+    return fake;
+  });
+  return calls;
+}
+
+// Find a route handler on the router so it can run without the auth middleware
+function routeHandler(router, method, routePath) {
+  const layer = router.stack.find(
+    (l) => l.route && l.route.path === routePath && l.route.methods[method]
+  );
+  const stack = layer.route.stack;
+  return stack[stack.length - 1].handle;
+}
+
+function fakeResponse() {
+  const res = {};
+  res.done = new Promise((resolve) => {
+    res.status = (code) => {
+      res.statusCode = code;
+      return res;
+    };
+    res.json = (body) => {
+      res.body = body;
+      resolve(res);
+      return res;
+    };
+  });
+  return res;
+}
+
+module.exports = { silenceLogger, fakeSpawn, routeHandler, fakeResponse };
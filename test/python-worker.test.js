@@ -0,0 +1,41 @@
+// test/python-worker.test.js
+const test = require("node:test");
+const assert = require("node:assert");
+const path = require("path");
+const { silenceLogger, fakeSpawn } = require("./helpers");
+
+const ROOT = path.join(__dirname, "..");
+
+test("the grading worker runs the professor's grading_worker.py", async (t) => {
+  silenceLogger();
+  const calls = fakeSpawn(t.mock, (fake) => {
+    fake.stdout.emit("data", JSON.stringify({ ready: true, port: 4321 }) + "\n");
+  });
+  const { getWorker } = require("../utils/python-worker");
+
+  const worker = await getWorker("prof_sean");
+
+  assert.strictEqual(worker.port, 4321);
+  assert.strictEqual(calls.length, 1);
+  const [script, ...args] = calls[0].argv;
+  assert.strictEqual(
+    script,
+    path.join(ROOT, "uploads", "prof_sean", "grading_worker.py")
+  );
+  assert.deepStrictEqual(args.slice(0, 2), ["--professorUsername", "prof_sean"]);
+  worker.process.emit("exit", 0, null);
+});
+
+test("resolvePythonScript falls back to the project root", () => {
+  silenceLogger();
+  const { resolvePythonScript } = require("../utils/python-helpers");
+
+  assert.strictEqual(
+    resolvePythonScript("analyze_excel", "prof_sean"),
+    path.join(ROOT, "analyze_excel.py")
+  );
+  assert.strictEqual(
+    resolvePythonScript("rag_pipeline", "prof_sean"),
+    path.join(ROOT, "uploads", "prof_sean", "rag_pipeline.py")
+  );
+});
@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "uploads", "prof_sean"))
+
+from json_extract import extract_json_object  # noqa: E402
+
+
+class ExtractJsonObjectTest(unittest.TestCase):
+
+    def test_smart_quotes_inside_strings_are_kept(self):
+        reply = '{"score": 20, "feedback": "Don\'t just say “review”.",}'
+        self.assertEqual(
+            extract_json_object(reply),
+            ({"score": 20, "feedback": "Don't just say “review”."}, True),
+        )
+
+    def test_smart_quotes_as_delimiters_are_straightened(self):
+        reply = '{“score”: 18, “feedback”: “Cite “Porter” more”}'
+        self.assertEqual(
+            extract_json_object(reply),
+            ({"score": 18, "feedback": "Cite “Porter” more"}, True),
+        )
+
+    def test_trailing_comma_and_python_literals(self):
+        reply = 'Here you go:\n```json\n{"passed": True, "notes": None,}\n```'
+        self.assertEqual(
+            extract_json_object(reply), ({"passed": True, "notes": None}, True)
+        )
+
+    def test_truncated_reply_is_closed(self):
+        self.assertEqual(
+            extract_json_object('{"score": 12, "feedback": "Good struc'),
+            ({"score": 12, "feedback": "Good struc"}, True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 role_description = """
-You are a highly detailed and {}} evaluator. Generate **concise, specific feedback** with actionable suggestions, teaching-oriented examples, and a natural, supportive tone that acknowledges student efforts constructively while aligning with the rubric.
+You are a highly detailed and rigorous evaluator. Generate **concise, specific feedback** with actionable suggestions, teaching-oriented examples, and a natural, supportive tone that acknowledges student efforts constructively while aligning with the rubric.
 """
 
 feedback_instructions = """
@@ -10,7 +10,7 @@ Evaluate the student's response with **concise, structured, and actionable feedb
    - **For mid-range responses:** Highlight strengths, but provide **clear, structured feedback on weak areas**.  
    - **For weak responses:** Directly address misunderstandings with **precise, actionable next steps**.  
    - **Avoid vague or repetitive feedback—each response should feel tailored.**  
-   - **Use {{rag_context}} for relevant guidance**, but do **not** just suggest “Review course material.” Instead, integrate key insights into the feedback.    
+   - **Use the Relevant Context given with the essay for relevant guidance**, but do **not** just suggest “Review course material.” Instead, integrate key insights into the feedback.    
    - If the response **is fundamentally incorrect**, the feedback should **focus on identifying errors, not refining ideas**.  
 
 ### **Tone & Specificity**
@@ -38,11 +38,14 @@ Return the output as a **JSON object only**:
 """
 
 
-# Define the grading prompts using the common parts
-# Define Agent 1: Identification and Order of Steps (30 Points)
-agent_1_prompt = f"""
-{role_description}
+# ============================
+# 🔹 Rubric Criteria
+# ============================
+# One block per criterion. The per-agent prompts below wrap each block with
+# the shared instructions; combined_prompt sends all four in one request.
 
+# Agent 1: Identification and Order of Steps (30 Points)
+agent_1_criteria = """
 ### **Agent 1: Identification and Order of Steps (30 Points)**
 
 #### **Evaluation Criteria**
@@ -56,19 +59,10 @@ agent_1_prompt = f"""
 - **Apply proportional deductions for errors:**  
   - **Each step is worth 7.5 marks, if any of the steps are missing or incorrect deduct corresponding marks.**
   - If steps are **listed but in the wrong order**, deduct points and do grade partially.   
-
-#### **Scoring & Feedback Requirements:**  
-{feedback_instructions}  
-{json_output_format}  
-
-Essay: {{essay}}  
-Relevant Context: {{rag_context}}
 """
 
 
-agent_2_prompt = f"""
-{role_description}
-
+agent_2_criteria = """
 ### **Agent 2: Explanation of Steps (30 Points)**
 **Each of the four steps must be clearly explained with relevant details.** 
 
@@ -78,19 +72,10 @@ agent_2_prompt = f"""
   - If a step is **explained vaguely**, apply **partial deductions**.  
   - If **only 1-2 steps are explained in detail**, **cap the score at 10-15 points**.  
   - If **3 steps are explained well**, **cap at 20-25 points**.
-
-#### **Scoring & Feedback Requirements:**  
-{feedback_instructions}  
-{json_output_format}
-
-Essay: {{essay}}  
-Relevant Context: {{rag_context}}
 """
 
 
-agent_3_prompt = f"""
-{role_description}
-
+agent_3_criteria = """
 ### **Agent 3: Understanding the Goals of the Steps (30 Points)**
 
 #### **Evaluation Criteria**
@@ -105,16 +90,9 @@ agent_3_prompt = f"""
     then **full credit should be given for interlinking.**  
   - If the interlinking is **partially present but lacks clarity**, **partial credit should be awarded** with feedback suggesting a stronger logical connection.  
   - If there is **no logical connection** between the steps, **significant deductions should be applied**.
-
-#### **Scoring & Feedback Requirements:**  
-{feedback_instructions}  
-{json_output_format}  
-
-Essay: {{essay}}  
-Relevant Context: {{rag_context}}
 """
 
-agent_4_prompt = f"""
+agent_4_criteria = """
 ### **Agent 4: Clarity and Organization (10 Points)**
 
 #### **Evaluation Criteria**
@@ -129,14 +107,92 @@ agent_4_prompt = f"""
 
 - **Logical flow over correctness:**  
   - Even if grammar is perfect, **if ideas jump around without clear connections, deductions apply.**
+"""
 
-#### **Scoring & Feedback Requirements:**  
-{feedback_instructions}  
-{json_output_format.replace('30', '10')}  
+# ============================
+# 🔹 Per-Agent Prompts
+# ============================
+# Static text comes first and the per-essay parts last, so every call for a
+# criterion starts with the same bytes: role and shared instructions, then
+# the criterion and its output format, then PROMPT_SUFFIX. The backend can
+# then reuse the prefix's prefill (see script.build_prompt).
+
+PROMPT_SUFFIX = """
+Relevant Context: {rag_context}
 
-Essay: {{essay}}  
-Relevant Context: {{rag_context}}
+Essay: {essay}
 """
 
+shared_prefix = f"""
+{role_description}
+#### **Scoring & Feedback Requirements:**  
+{feedback_instructions}"""
+
+agent_1_prompt = f"""{shared_prefix}
+{agent_1_criteria}
+{json_output_format}{PROMPT_SUFFIX}"""
+
+
+agent_2_prompt = f"""{shared_prefix}
+{agent_2_criteria}
+{json_output_format}{PROMPT_SUFFIX}"""
+
+
+agent_3_prompt = f"""{shared_prefix}
+{agent_3_criteria}
+{json_output_format}{PROMPT_SUFFIX}"""
+
+agent_4_prompt = f"""{shared_prefix}
+{agent_4_criteria}
+{json_output_format.replace('30', '10')}{PROMPT_SUFFIX}"""
+
+# ============================
+# 🔹 Combined Prompt
+# ============================
+# Grades every criterion in one generation, so the role, instructions,
+# essay and context are sent once instead of four times.
 
+# JSON keys for each criterion, in the same order as the per-agent prompts
+CRITERION_KEYS = ["identification", "explanation", "goals", "clarity"]
+
+combined_json_output_format = """
+### **Instructions**
+You MUST return the output **strictly in JSON format**, without any additional text, explanations, or headings.
+**Do NOT include any markdown (` ``` `), formatting, or extra commentary.**
+**Do NOT wrap the JSON inside backticks or code blocks.**
+Return the output as a **single JSON object only**, with one entry per criterion:
+{{
+  "identification": {{"score": <score out of 30>, "feedback": "<concise, clear feedback (in between 60-80 words)>"}},
+  "explanation": {{"score": <score out of 30>, "feedback": "<concise, clear feedback (in between 60-80 words)>"}},
+  "goals": {{"score": <score out of 30>, "feedback": "<concise, clear feedback (in between 60-80 words)>"}},
+  "clarity": {{"score": <score out of 10>, "feedback": "<concise, clear feedback (in between 60-80 words)>"}}
+}}
+"""
 
+combined_prompt = f"""{shared_prefix}
+Grade the essay against **each of the four criteria below independently**. Score each criterion only on its own requirements.
+{agent_1_criteria}
+{agent_2_criteria}
+{agent_3_criteria}
+{agent_4_criteria}
+{combined_json_output_format}{PROMPT_SUFFIX}"""
+
+# ============================
+# 🔹 Output Schemas
+# ============================
+# JSON schemas for backends that can constrain generation (`format`).
+
+feedback_schema = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number"},
+        "feedback": {"type": "string"},
+    },
+    "required": ["score", "feedback"],
+}
+
+combined_feedback_schema = {
+    "type": "object",
+    "properties": {key: feedback_schema for key in CRITERION_KEYS},
+    "required": CRITERION_KEYS,
+}
@@ -4,9 +4,11 @@ import json
 import argparse
 import logging
 import random
-import requests
 from typing import List, Dict, Any
 
+from json_extract import extract_json_object
+import llm_client  # Shared pooled HTTP client for LLM calls
+
 # Set up logging
 
 
@@ -34,7 +36,11 @@ except ImportError:
     logger.warning(
         "Could not import from rag_pipeline, will use sample retrieval function")
 
-    def retrieve_relevant_text(query, category, k=5, professor_username=None, project_root=None):
+    def get_indices_path(professor_username, project_root):
+        """Mock indices path if rag_pipeline module is not available."""
+        return None
+
+    def retrieve_relevant_text(query, indices_path, k=5):
         """Mock retrieval function if rag_pipeline module is not available."""
         return [
             "Market segmentation is dividing a market into distinct groups of buyers with different needs, characteristics, or behaviors.",
@@ -78,14 +84,13 @@ def get_question_context(question: str, professor_username: str, project_root: s
         "Marketing Mix (4Ps)",
         "Marketing Strategy & Planning"
     ]
+    indices_path = get_indices_path(professor_username, project_root)
     all_contexts = []
     for category in categories:
         contexts = retrieve_relevant_text(
-            query=question,
-            category=category,
-            k=3,
-            professor_username=professor_username,
-            project_root=project_root
+            f"{category}: {question}",
+            indices_path,
+            k=3
         )
         all_contexts.extend(contexts)
     unique_contexts = list(set(all_contexts))
@@ -98,6 +103,7 @@ API_URL = "http://localhost:5001/api/generate"
 DEFAULT_TEMPERATURE = 0.3
 DEFAULT_TOP_P = 0.9
 DEFAULT_MAX_TOKENS = 4000
+READ_TIMEOUT = 300  # Full rubrics take much longer to generate than grading replies
 
 
 def send_post_request(prompt, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP_P, max_tokens=DEFAULT_MAX_TOKENS, model="llama3.1:8b"):
@@ -111,13 +117,10 @@ def send_post_request(prompt, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP
         "top_p": top_p,
         "max_tokens": max_tokens
     }
-    headers = {"Content-Type": "application/json"}
     logger.info(f"Sending request to local model: {model}")
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()["response"]
-    except requests.exceptions.RequestException as e:
+        return llm_client.post_json(url, payload, read_timeout=READ_TIMEOUT, use_cache=True)["response"]
+    except llm_client.LLMTransportError as e:
         logger.error(f"Error calling local model API: {str(e)}")
         raise
 
@@ -132,6 +135,8 @@ def generate_sample_rubrics(question: str, context: List[str], num_samples: int
     """
     logger.info(
         f"Generating {num_samples} sample rubrics using model: {model}...")
+    # The grading worker serves many requests, so log only this call's LLM stats
+    llm_stats_before = llm_client.get_stats()
 
     # Define different focus instructions for the three rubrics.
     focus_instructions = [
@@ -203,13 +208,10 @@ def generate_sample_rubrics(question: str, context: List[str], num_samples: int
                 max_tokens=1000,
                 model=model  # Use the model parameter passed to the function
             )
-            response = response.strip()
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end > json_start:
-                json_str = response[json_start:json_end]
+            rubric_json, repaired = extract_json_object(response)
+            llm_client.record_parse(model, rubric_json is not None, repaired)
+            if rubric_json is not None:
                 try:
-                    rubric_json = json.loads(json_str)
                     if "criteria" not in rubric_json:
                         rubric_json = {"criteria": rubric_json}
                     for criterion in rubric_json["criteria"]:
@@ -237,9 +239,9 @@ def generate_sample_rubrics(question: str, context: List[str], num_samples: int
                             rubric_json["criteria"][0]["weight"] += diff
                     sample_rubrics.append(rubric_json)
                     logger.info(f"Successfully generated sample rubric {i+1}")
-                except json.JSONDecodeError as e:
+                except (TypeError, KeyError, ZeroDivisionError) as e:
                     logger.error(
-                        f"Error parsing JSON from model response: {str(e)}")
+                        f"Unexpected rubric structure in model response: {str(e)}")
                     raise
             else:
                 logger.error("Could not find valid JSON in model response")
@@ -261,6 +263,7 @@ def generate_sample_rubrics(question: str, context: List[str], num_samples: int
                     } for j in range(3 if i == 0 else 4)
                 ]
             })
+    logger.info(f"LLM client stats: {json.dumps(llm_client.stats_since(llm_stats_before))}")
     return sample_rubrics
 
 
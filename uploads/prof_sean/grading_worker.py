@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import job_journal
+import progress
+
+# ============================
+# 🔹 Warm Imports
+# ============================
+# Loading these once is the whole point of the worker: langchain,
+# HuggingFace, pandas and the FAISS store stay loaded between requests.
+# They load in a background thread after the server is listening, so
+# /health and /analyze answer at once; grading and rubric requests wait for
+# the warm-up. If it fails the worker exits, and the Node side fails its
+# in-flight jobs and starts a fresh worker on the next request.
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_TIMEOUT = float(os.environ.get("WORKER_WARM_UP_TIMEOUT", "600"))
+
+_warm = threading.Event()
+_warm_state = {}  # script, generate_rubrics and indices_path once loaded
+
+# Active grading jobs, keyed by job ID
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def warm_up(professor_username, project_root):
+    """Import the grading modules and load the FAISS index and embedding model."""
+    start = time.perf_counter()
+    import script
+    import generate_rubrics
+    from rag_pipeline import get_indices_path, load_faiss_index, get_embeddings
+
+    indices_path = get_indices_path(professor_username, project_root)
+    faiss_store = load_faiss_index(indices_path)
+    if faiss_store is not None:
+        get_embeddings(faiss_store["meta"]["embedding_model"])
+        logger.info(f"Warmed FAISS index at {indices_path}")
+    _warm_state.update(script=script, generate_rubrics=generate_rubrics,
+                       indices_path=indices_path)
+    _warm.set()
+    logger.info(f"Worker warm-up finished in {time.perf_counter() - start:.1f}s")
+
+
+def start_warm_up(professor_username, project_root):
+    def target():
+        try:
+            warm_up(professor_username, project_root)
+        except Exception as e:
+            logger.error(f"Worker warm-up failed: {e}")
+            os._exit(1)
+
+    threading.Thread(target=target, name="warm-up", daemon=True).start()
+
+
+def wait_until_warm():
+    """Return the warm modules, waiting for the warm-up to finish."""
+    if not _warm.wait(WARM_UP_TIMEOUT):
+        raise TimeoutError("Grading worker is still warming up")
+    return _warm_state
+
+
+def import_analyze_excel(project_root):
+    """Import analyze_excel.py from the professor directory or project root."""
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    import analyze_excel
+    return analyze_excel
+
+# ============================
+# 🔹 Job Handlers
+# ============================
+
+
+def run_grading_job(payload):
+    """Run script.grade_file in a background thread, like a CLI grading run."""
+    job_id = payload.get("jobId")
+    output_dir = payload.get("outputDir") or "outputs"
+
+    def target():
+        try:
+            if not _warm.is_set() and job_id:
+                # Let status polls see the job before grade_file takes over
+                os.makedirs(output_dir, exist_ok=True)
+                progress.write_status(os.path.join(output_dir, f"{job_id}.status"), {
+                    "status": "processing", "progress": 0,
+                    "message": "Waiting for the grading worker to warm up"})
+            warm = wait_until_warm()
+            script = warm["script"]
+            script.grade_file(
+                payload.get("file"),
+                model=payload.get("model") or "llama3.1:latest",
+                job_id=job_id,
+                output_dir=output_dir,
+                indices_path=warm["indices_path"],
+                agent_concurrency=int(payload.get(
+                    "agentConcurrency", script.DEFAULT_AGENT_CONCURRENCY)),
+                workers=int(payload.get("workers", 1)),
+                strategy=payload.get("strategy") or script.DEFAULT_GRADING_STRATEGY,
+                resume=bool(payload.get("resume"))
+            )
+        except job_journal.JobRunningError as e:
+            # Another process owns the job; leave its status alone
+            logger.warning(f"Not starting grading job {job_id}: {e}")
+        except TimeoutError as e:
+            logger.error(f"Grading job {job_id} not started: {e}")
+            if job_id:
+                progress.write_status(os.path.join(output_dir, f"{job_id}.status"), {
+                    "status": "error", "message": str(e), "resumable": False})
+        except Exception as e:
+            # grade_file already recorded the error in the status file
+            logger.error(f"Grading job {job_id} failed: {e}")
+        finally:
+            with _jobs_lock:
+                _jobs.pop(job_id, None)
+
+    thread = threading.Thread(target=target, name=f"grade-{job_id}", daemon=True)
+    with _jobs_lock:
+        if job_id in _jobs:
+            raise job_journal.JobRunningError(f"Job {job_id} is already running")
+        _jobs[job_id] = thread
+    thread.start()
+    return {"success": True, "jobId": job_id}
+
+
+def run_sample_rubrics(payload, professor_username, project_root):
+    """Generate sample rubrics for a question using the warm RAG index."""
+    generate_rubrics = wait_until_warm()["generate_rubrics"]
+    context = generate_rubrics.get_question_context(
+        payload["question"], professor_username, project_root)
+    sample_rubrics = generate_rubrics.generate_sample_rubrics(
+        payload["question"],
+        context,
+        int(payload.get("numSamples", 3)),
+        payload.get("model") or "llama3.1:8b"
+    )
+    return {
+        "success": True,
+        "message": f"Generated {len(sample_rubrics)} sample rubrics",
+        "sampleRubrics": sample_rubrics
+    }
+
+# ============================
+# 🔹 HTTP Server
+# ============================
+
+
+def make_handler(professor_username, project_root, analyze_excel):
+    """Build a request handler bound to one professor's warm state."""
+
+    class WorkerHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.info(f"Worker request: {format % args}")
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self.send_json(404, {"success": False, "message": "Not found"})
+            with _jobs_lock:
+                active_jobs = list(_jobs)
+            self.send_json(200, {
+                "success": True,
+                "professor": professor_username,
+                "warm": _warm.is_set(),
+                "activeJobs": active_jobs
+            })
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                if self.path == "/grade":
+                    try:
+                        result = run_grading_job(payload)
+                    except job_journal.JobRunningError as e:
+                        return self.send_json(409, {"success": False, "error": str(e)})
+                    return self.send_json(202, result)
+                if self.path == "/analyze":
+                    return self.send_json(200, analyze_excel.analyze_file(
+                        payload["file"],
+                        payload.get("mode") or "full",
+                        payload.get("offset") or 0,
+                        payload.get("limit") or analyze_excel.DEFAULT_PREVIEW_LIMIT))
+                if self.path == "/generate-sample-rubrics":
+                    result = run_sample_rubrics(
+                        payload, professor_username, project_root)
+                    return self.send_json(200, result)
+
+                self.send_json(404, {"success": False, "message": "Not found"})
+            except TimeoutError as e:
+                self.send_json(503, {"success": False, "error": str(e)})
+            except Exception as e:
+                logger.error(f"Worker error on {self.path}: {e}")
+                self.send_json(500, {"success": False, "error": str(e)})
+
+    return WorkerHandler
+
+# ============================
+# 🔹 CLI Handling
+# ============================
+
+
+def parse_arguments():
+    """Parses command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Long-lived grading worker for one professor")
+    parser.add_argument("--professorUsername", required=True,
+                        help="Professor username (for multi-professor support)")
+    parser.add_argument("--projectRoot", required=True,
+                        help="Absolute path to project root")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Interface to bind (keep local)")
+    parser.add_argument("--port", type=int, default=0,
+                        help="Port to listen on (0 picks a free port)")
+    return parser.parse_args()
+
+
+def main():
+    """Serve requests until the parent process stops us, warming up in the background."""
+    args = parse_arguments()
+
+    analyze_excel = import_analyze_excel(args.projectRoot)
+    handler = make_handler(args.professorUsername, args.projectRoot, analyze_excel)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+
+    # The Node side waits for this line on stdout before sending requests
+    print(json.dumps({"ready": True, "port": server.server_address[1]}), flush=True)
+    logger.info(
+        f"Grading worker for {args.professorUsername} listening on port {server.server_address[1]}")
+    start_warm_up(args.professorUsername, args.projectRoot)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# 🔹 Ingestion Cache
+# ============================
+# Content-addressed cache for the expensive ingestion steps, one SQLite file
+# per professor. Three layers, each keyed by content rather than file name:
+#   pages       extracted (page, text) stream, keyed by the file's content hash
+#   chunks      chunk lists, keyed by text hash plus splitter parameters
+#   embedding   float32 vectors, keyed by model name plus chunk hash
+# Pages and chunks are zlib-compressed; pages are encoded and decoded
+# incrementally so a cached textbook is never fully decompressed in memory.
+# Least recently used entries are evicted once the total stored size passes
+# INGEST_CACHE_MAX_BYTES.
+
+INGEST_CACHE_ENABLED = os.environ.get("INGEST_CACHE", "1") != "0"
+INGEST_CACHE_MAX_BYTES = int(os.environ.get(
+    "INGEST_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+"""
+
+
+def text_sha256(text):
+    """Hash a string's UTF-8 bytes."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def connect(cache_path):
+    """Open (creating if needed) the cache database, or None when disabled."""
+    if not INGEST_CACHE_ENABLED or not cache_path:
+        return None
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    conn = sqlite3.connect(cache_path, timeout=30)
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def _get(conn, kind, key):
+    row = conn.execute(
+        "SELECT value FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+    if row is None:
+        return None
+    conn.execute("UPDATE entries SET accessed = ? WHERE kind = ? AND key = ?",
+                 (time.time(), kind, key))
+    return row[0]
+
+
+def _put(conn, kind, key, value):
+    conn.execute(
+        "INSERT OR REPLACE INTO entries (kind, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+        (kind, key, value, len(value), time.time()))
+
+# ============================
+# 🔹 Cache Layers
+# ============================
+
+
+class PageRecorder:
+    """Wrap a (page, text) stream, hashing and compressing pages as they pass.
+
+    After the stream is consumed, `text_hash` identifies the extracted text
+    and `blob` holds the compressed pages ready for put_pages.
+    """
+
+    def __init__(self, pages):
+        self._pages = pages
+        self._digest = hashlib.sha256()
+        self._compressor = zlib.compressobj()
+        self._parts = []
+        self.blob = None
+        self.text_hash = None
+
+    def __iter__(self):
+        for page, text in self._pages:
+            self._digest.update(text.encode("utf-8"))
+            self._digest.update(b"\n")
+            self._parts.append(self._compressor.compress(
+                (json.dumps([page, text]) + "\n").encode("utf-8")))
+            yield page, text
+        self._parts.append(self._compressor.flush())
+        self.blob = b"".join(self._parts)
+        self.text_hash = self._digest.hexdigest()
+
+
+def _decode_pages(blob, block_size=64 * 1024):
+    decompressor = zlib.decompressobj()
+    pending = b""
+    for start in range(0, len(blob), block_size):
+        pending += decompressor.decompress(blob[start:start + block_size])
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            page, text = json.loads(line)
+            yield page, text
+
+
+def get_pages(conn, file_hash):
+    """Return (text_hash, page iterator factory) for a cached file, or None."""
+    value = _get(conn, "pages", file_hash)
+    if value is None:
+        return None
+    conn.commit()
+
+    digest = hashlib.sha256()
+    for _, text in _decode_pages(value):
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest(), lambda: _decode_pages(value)
+
+
+def put_pages(conn, file_hash, recorder):
+    _put(conn, "pages", file_hash, recorder.blob)
+    conn.commit()
+
+
+def _chunks_key(text_hash, chunk_size, chunk_overlap):
+    return f"{text_hash}:{chunk_size}:{chunk_overlap}"
+
+
+def get_chunks(conn, text_hash, chunk_size, chunk_overlap):
+    value = _get(conn, "chunks", _chunks_key(
+        text_hash, chunk_size, chunk_overlap))
+    return json.loads(zlib.decompress(value)) if value is not None else None
+
+
+def put_chunks(conn, text_hash, chunk_size, chunk_overlap, chunks):
+    _put(conn, "chunks", _chunks_key(text_hash, chunk_size, chunk_overlap),
+         zlib.compress(json.dumps(chunks).encode("utf-8")))
+    conn.commit()
+
+
+def get_embeddings(conn, model_name, chunk_hashes):
+    """Return {chunk_hash: vector} for the hashes already embedded with this model."""
+    found = {}
+    for chunk_hash in set(chunk_hashes):
+        value = _get(conn, "embedding", f"{model_name}:{chunk_hash}")
+        if value is not None:
+            found[chunk_hash] = np.frombuffer(value, dtype="float32")
+    conn.commit()
+    return found
+
+
+def put_embeddings(conn, model_name, vectors_by_hash):
+    for chunk_hash, vector in vectors_by_hash.items():
+        _put(conn, "embedding", f"{model_name}:{chunk_hash}",
+             np.asarray(vector, dtype="float32").tobytes())
+    conn.commit()
+
+# ============================
+# 🔹 Eviction
+# ============================
+
+
+def evict(conn, max_bytes=INGEST_CACHE_MAX_BYTES):
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    total = conn.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+
+    evicted = 0
+    rows = conn.execute(
+        "SELECT kind, key, size FROM entries ORDER BY accessed").fetchall()
+    for kind, key, size in rows:
+        if total <= max_bytes:
+            break
+        conn.execute(
+            "DELETE FROM entries WHERE kind = ? AND key = ?", (kind, key))
+        total -= size
+        evicted += 1
+    conn.commit()
+    conn.execute("VACUUM")
+
+    logger.info(f"Evicted {evicted} ingestion cache entries")
+    return evicted
+
+
+def get_stats(conn):
+    """Return entry counts and stored bytes per cache layer."""
+    stats = {}
+    for kind, count, size in conn.execute(
+            "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY kind"):
+        stats[kind] = {"entries": count, "bytes": size}
+    return stats
@@ -0,0 +1,108 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# 🔹 Grading Job Journal
+# ============================
+# Append-only JSONL log of a grading job, kept next to its .status file:
+#   {"type": "job", "file", "sha256", "model", "strategy"}   first line
+#   {"type": "row", "position", "index", "values"}           one per essay
+# Each finished essay is flushed (and fsynced) before it counts as done, so
+# after a crash `script.py --resume <job-id>` regrades only the rows that
+# are missing and rebuilds the workbook from the journal plus the new rows.
+# A run holds an exclusive lock on `<job-id>.lock` for its whole length, so
+# a resume started while the job is still running fails instead of
+# appending to the same journal and racing on the same workbook. The lock
+# goes away with the process, so a crashed job can always be resumed.
+
+JOURNAL_FSYNC = os.environ.get("JOURNAL_FSYNC", "1") != "0"
+
+
+def journal_path(output_dir, job_id):
+    return os.path.join(output_dir, f"{job_id}.journal.jsonl")
+
+
+# script.py exits with this (EX_TEMPFAIL) when the job is already running
+JOB_RUNNING_EXIT_CODE = 75
+
+
+class JobRunningError(RuntimeError):
+    """Another process (or worker thread) is already running this job."""
+
+
+@contextmanager
+def job_lock(output_dir, job_id):
+    """Hold the job's lock for the duration of a run, or raise JobRunningError."""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, f"{job_id}.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise JobRunningError(f"Job {job_id} is already running")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def file_sha256(file_path):
+    """Hash the input file so a resume can't silently mix two workbooks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_journal(path):
+    """Return (header, {position: values}) from a journal.
+
+    A torn last line (the process died mid-write) is ignored.
+    """
+    header, rows = None, {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(f"Ignoring incomplete journal line in {path}")
+                continue
+            if entry.get("type") == "job":
+                header = entry
+            elif entry.get("type") == "row":
+                rows[entry["position"]] = entry["values"]
+    if header is None:
+        raise ValueError(f"Journal has no job header: {path}")
+    return header, rows
+
+
+class JobJournal:
+    """Append finished essays to a job's journal."""
+
+    def __init__(self, path, header=None):
+        self.path = path
+        # A resume (no header) appends to the earlier entries; a new run that
+        # reuses a job ID starts a fresh journal instead of a second header
+        self._file = open(path, "a" if header is None else "w", encoding="utf-8")
+        if header is not None:
+            self._append({"type": "job", **header})
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, default=str) + "\n")
+        self._file.flush()
+        if JOURNAL_FSYNC:
+            os.fsync(self._file.fileno())
+
+    def record(self, position, index, values):
+        """Record one graded row by its read position and input row index."""
+        self._append({"type": "row", "position": position,
+                     "index": index, "values": values})
+
+    def close(self):
+        self._file.close()
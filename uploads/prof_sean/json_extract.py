@@ -0,0 +1,175 @@
+import json
+
+# ============================
+# 🔹 Incremental JSON Scanner
+# ============================
+# Finds the first balanced top-level JSON object in text that arrives in
+# pieces, such as streamed model tokens. Braces inside strings (and escaped
+# quotes) are ignored, so the scanner can tell exactly when the object the
+# model was asked for has closed and the rest of the stream can be dropped.
+
+
+class JsonObjectScanner:
+    """Feed text pieces; `complete` turns True once a top-level object closes."""
+
+    def __init__(self):
+        self.text = ""
+        self.start = None   # index of the opening brace
+        self.end = None     # index just past the closing brace
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+    def feed(self, piece):
+        """Scan the next piece of text; return True once the object is complete."""
+        if self.complete:
+            return True
+
+        offset = len(self.text)
+        self.text += piece
+        for i in range(offset, len(self.text)):
+            char = self.text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif self.start is None:
+                if char == "{":
+                    self.start = i
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = i + 1
+                    return True
+        return False
+
+    def object_text(self):
+        """The complete object's text, or everything seen so far if it never closed."""
+        if self.complete:
+            return self.text[self.start:self.end]
+        return self.text
+
+
+# ============================
+# 🔹 Tolerant Extraction
+# ============================
+# Models wrap the object in prose or markdown fences, use smart quotes, leave
+# trailing commas, write Python literals, put raw newlines inside strings or
+# stop mid-object at max_tokens. extract_json_object handles all of these in
+# one pass plus a repair, so no LLM retry is spent on a fixable reply.
+
+_SMART_QUOTES = "“”"
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _ends_string(text, i):
+    """True if the quote at text[i] sits where a string must end (before : , } ] or EOF)."""
+    rest = text[i + 1:].lstrip()
+    return not rest or rest[0] in ":,}]"
+
+
+def repair_json(text):
+    """Best-effort fix of common model JSON mistakes, scanning the text once.
+
+    Outside strings: turns smart quotes into straight ones, drops trailing
+    commas and maps True/False/None to JSON literals. Inside strings: escapes
+    raw control characters and keeps smart quotes as text unless one is
+    where the string has to end. At the end, closes an unterminated string
+    and any open brackets.
+    """
+    out = []
+    closers = []
+    in_string = escaped = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char in _SMART_QUOTES and _ends_string(text, i):
+                char = '"'
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char in "\r\t":
+                char = "\\r" if char == "\r" else "\\t"
+            out.append(char)
+        elif char == '"' or char in _SMART_QUOTES:
+            in_string = True
+            out.append('"')
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if closers:
+                closers.pop()
+            out.append(char)
+        elif char.isalpha():
+            word_end = i
+            while word_end < len(text) and text[word_end].isalpha():
+                word_end += 1
+            word = text[i:word_end]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = word_end
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(closers))
+    return "".join(out)
+
+
+def extract_json_object(text):
+    """Return (object, repaired) for the first JSON object in text, or (None, False).
+
+    The first balanced object is parsed as-is; if that fails, it is repaired
+    once and parsed again.
+    """
+    if not isinstance(text, str):
+        return None, False
+
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+    if scanner.start is None:
+        return None, False
+    candidate = scanner.object_text() if scanner.complete else text[scanner.start:]
+
+    try:
+        result = json.loads(candidate)
+        return (result, False) if isinstance(result, dict) else (None, False)
+    except ValueError:
+        pass
+
+    try:
+        result = json.loads(repair_json(candidate))
+        return (result, True) if isinstance(result, dict) else (None, False)
+    except ValueError:
+        return None, False
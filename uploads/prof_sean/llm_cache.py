@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# 🔹 LLM Response Cache
+# ============================
+# On-disk cache of LLM replies, keyed by a hash of the full request payload
+# (model, prompt, temperature, top_p, max_tokens and anything else sent).
+# Regrading an unchanged workbook against an unchanged rubric then costs a
+# SQLite lookup per agent instead of an LLM round-trip. Entries expire after
+# LLM_CACHE_TTL seconds, and least recently used entries are evicted once
+# the total size passes LLM_CACHE_MAX_BYTES. The cache is optional and off
+# by default (a cached reply repeats a grade instead of sampling a new one);
+# set LLM_CACHE=1 to enable it.
+
+# Scripts live in uploads/<professor>/, so by default the cache sits with
+# that professor's grading output in outputs/<professor>/, not in the
+# source tree.
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "0") == "1"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH") or os.path.join(
+    _SCRIPT_DIR, "..", "..", "outputs", os.path.basename(_SCRIPT_DIR), "llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.environ.get(
+    "LLM_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+)
+"""
+
+# Grading runs agents on several threads; SQLite connections stay per thread
+_local = threading.local()
+
+
+def request_key(url, payload):
+    """Hash a request so that any change to model, prompt or sampling misses."""
+    canonical = json.dumps({"url": url, "payload": payload}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(LLM_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30)
+        conn.execute(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def get(key):
+    """Return the cached reply for a request key, or None on a miss or expiry."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    try:
+        conn = _connection()
+        row = conn.execute(
+            "SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > LLM_CACHE_TTL:
+            return None
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?",
+                     (time.time(), key))
+        conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+    except (sqlite3.Error, zlib.error, ValueError) as e:
+        # A broken cache must never fail a grading job
+        logger.warning(f"LLM cache read failed: {e}")
+        return None
+
+
+def put(key, reply):
+    """Store a reply under a request key, replacing any previous entry."""
+    if not LLM_CACHE_ENABLED:
+        return
+    try:
+        value = zlib.compress(json.dumps(reply).encode("utf-8"))
+        now = time.time()
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now, now))
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache write failed: {e}")
+
+
+def evict(max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL):
+    """Drop expired entries, then least recently used ones until under max_bytes."""
+    if not LLM_CACHE_ENABLED:
+        return 0
+    conn = _connection()
+    evicted = conn.execute(
+        "DELETE FROM responses WHERE created < ?", (time.time() - ttl,)).rowcount
+
+    total = conn.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total > max_bytes:
+        rows = conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        for key, size in rows:
+            if total <= max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+    conn.commit()
+
+    if evicted:
+        logger.info(f"Evicted {evicted} LLM cache entries")
+    return evicted
+
+
+def get_stats():
+    """Return the number of cached replies and their stored size."""
+    if not LLM_CACHE_ENABLED:
+        return {"enabled": False}
+    count, size = _connection().execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    return {"enabled": True, "entries": count, "bytes": size}
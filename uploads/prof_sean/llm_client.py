@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import llm_cache
+from json_extract import JsonObjectScanner
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# 🔹 Configuration
+# ============================
+# Shared by script.py and generate_rubrics.py. Environment variables let
+# the Node side tune the client without touching either script.
+
+POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "8"))
+
+# Status codes worth retrying: the backend is busy or briefly down
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMTransportError(Exception):
+    """The LLM backend could not be reached or kept failing after all retries."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status  # HTTP status of a rejected request, if any
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# ============================
+# 🔹 Call Statistics
+# ============================
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "failures": 0,
+    "transport_retries": 0,
+    "output_retries": 0,
+    "cache_hits": 0,
+    "cache_misses": 0,
+    "stream_early_stops": 0,
+    "latency_total_s": 0.0,
+}
+# Recent per-call latencies in seconds (bounded so long jobs stay flat)
+_latencies = deque(maxlen=10000)
+# Output parsing outcomes per model: replies, repaired, parse_failures, output_retries
+_model_stats = {}
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _count_model(model, key):
+    with _stats_lock:
+        stats = _model_stats.setdefault(model, {
+            "replies": 0, "repaired": 0, "parse_failures": 0, "output_retries": 0})
+        stats[key] += 1
+
+
+def record_output_retry(model=None):
+    """Count a retry spent because the model's output was unusable."""
+    _count("output_retries")
+    if model:
+        _count_model(model, "output_retries")
+
+
+def record_parse(model, ok, repaired=False):
+    """Count one reply's parse outcome for a model."""
+    _count_model(model, "replies")
+    if not ok:
+        _count_model(model, "parse_failures")
+    elif repaired:
+        _count_model(model, "repaired")
+
+
+def _add_rates(stats):
+    replies = stats["replies"] or 1
+    stats["parse_failure_rate"] = round(stats["parse_failures"] / replies, 4)
+    stats["repair_rate"] = round(stats["repaired"] / replies, 4)
+    stats["retry_rate"] = round(stats["output_retries"] / replies, 4)
+    return stats
+
+
+def get_stats():
+    """Return a snapshot of call counts, retries and latency percentiles."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+        latencies = sorted(_latencies)
+        per_model = {model: _add_rates(dict(stats)) for model, stats in _model_stats.items()}
+
+    snapshot["latency_total_s"] = round(snapshot["latency_total_s"], 4)
+    snapshot["per_model"] = per_model
+
+    if latencies:
+        snapshot["latency_mean_s"] = round(sum(latencies) / len(latencies), 4)
+        snapshot["latency_p50_s"] = round(latencies[len(latencies) // 2], 4)
+        snapshot["latency_p95_s"] = round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4)
+        snapshot["latency_max_s"] = round(latencies[-1], 4)
+    return snapshot
+
+
+def stats_since(before):
+    """Counts accumulated since an earlier get_stats() snapshot.
+
+    A worker grades many jobs in one process, so each job reports this
+    difference rather than the process totals. Jobs running at the same
+    time still share counts, and percentiles can't be split per job, so
+    only the mean latency is given.
+    """
+    now = get_stats()
+    delta = {key: now[key] - before.get(key, 0) for key in _stats}
+    delta["latency_total_s"] = round(delta["latency_total_s"], 4)
+    if delta["calls"]:
+        delta["latency_mean_s"] = round(delta["latency_total_s"] / delta["calls"], 4)
+
+    per_model = {}
+    for model, stats in now["per_model"].items():
+        earlier = before.get("per_model", {}).get(model, {})
+        counts = {key: stats[key] - earlier.get(key, 0)
+                  for key in ("replies", "repaired", "parse_failures", "output_retries")}
+        if any(counts.values()):
+            per_model[model] = _add_rates(counts)
+    delta["per_model"] = per_model
+    return delta
+
+
+def reset_stats():
+    """Clear all counters (used between jobs in a long-lived worker)."""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0.0 if key == "latency_total_s" else 0
+        _latencies.clear()
+        _model_stats.clear()
+
+# ============================
+# 🔹 HTTP Session
+# ============================
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                                  pool_maxsize=POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def configure(pool_size=None, connect_timeout=None, read_timeout=None, max_retries=None):
+    """Override client settings; the session is rebuilt on the next call."""
+    global POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, _session
+    with _session_lock:
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if max_retries is not None:
+            MAX_RETRIES = max_retries
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff, so parallel callers don't retry in lockstep."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+# ============================
+# 🔹 Requests
+# ============================
+
+
+def read_stream_until_object(response):
+    """Read an NDJSON generate stream until the reply's JSON object closes.
+
+    Returns a reply shaped like a non-streaming one ({"response", "done"}).
+    The connection is closed as soon as the object is complete, so filler
+    the model generates after the closing brace is never waited for.
+    """
+    scanner = JsonObjectScanner()
+    last = {}
+    try:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            last = json.loads(line)
+            if scanner.feed(last.get("response", "")):
+                _count("stream_early_stops")
+                return {"response": scanner.object_text(), "done": True, "early_stop": True}
+            if last.get("done"):
+                break
+    finally:
+        response.close()
+    return {**last, "response": scanner.text, "done": True}
+
+
+def post_json(url, payload, read_timeout=None, use_cache=False, refresh_cache=False, stream=False):
+    """POST a JSON payload and return the decoded JSON reply.
+
+    Connection errors, timeouts and 429/5xx replies are retried with jittered
+    backoff; anything still failing raises LLMTransportError. Whether the
+    model's *output* is usable is the caller's decision — see
+    record_output_retry for counting those retries.
+
+    With `use_cache`, replies are served from and stored in llm_cache.
+    `refresh_cache` skips the lookup but still stores the fresh reply; use it
+    when retrying because a cached reply turned out to be unusable.
+
+    With `stream`, the request is streamed and reading stops once the reply
+    holds a complete JSON object (see read_stream_until_object).
+    """
+    if use_cache:
+        key = llm_cache.request_key(url, payload)
+        if not refresh_cache:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                _count("cache_hits")
+                return cached
+            _count("cache_misses")
+        data = post_json(url, payload, read_timeout, stream=stream)
+        llm_cache.put(key, data)
+        return data
+
+    session = get_session()
+    timeout = (CONNECT_TIMEOUT, read_timeout or READ_TIMEOUT)
+    last_error = None
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            _count("transport_retries")
+            delay = backoff_delay(attempt - 1)
+            logger.warning(
+                f"LLM transport retry {attempt}/{MAX_RETRIES} in {delay:.2f}s: {last_error}")
+            time.sleep(delay)
+
+        start = time.perf_counter()
+        try:
+            response = session.post(
+                url, json={**payload, "stream": True} if stream else payload,
+                timeout=timeout, stream=stream)
+            if response.status_code in RETRYABLE_STATUS:
+                last_error = f"HTTP {response.status_code}"
+                response.close()
+                continue
+            response.raise_for_status()
+            data = read_stream_until_object(response) if stream else response.json()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            # Includes a streamed reply cut off mid-body
+            last_error = e
+            continue
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # 4xx or a non-JSON body: retrying the same request won't help
+            _count("failures")
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            raise LLMTransportError(f"LLM request failed: {e}", status) from e
+        finally:
+            latency = time.perf_counter() - start
+            with _stats_lock:
+                _stats["calls"] += 1
+                _stats["latency_total_s"] += latency
+                _latencies.append(latency)
+
+        return data
+
+    _count("failures")
+    raise LLMTransportError(
+        f"LLM request failed after {MAX_RETRIES + 1} attempts: {last_error}")
@@ -0,0 +1,283 @@
+import os
+import sys
+import time
+import json
+import logging
+import threading
+import functools
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# 🔹 Stage Timing Spans
+# ============================
+# span("stage") / @timed("stage") time a block and record it into every
+# active JobMetrics collector. A job opens a collector at its start and
+# writes the aggregate (count, total and percentiles per stage) at its end,
+# as JSON and optionally as a Prometheus textfile-collector .prom file.
+# Collectors see every span in the process, so jobs running side by side in
+# the worker include each other's spans. METRICS=0 turns spans into no-ops.
+
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_PROMETHEUS = os.environ.get("METRICS_PROMETHEUS", "0") == "1"
+SAMPLES_PER_STAGE = 10000  # durations kept per stage for percentiles
+
+_collectors = []
+_collectors_lock = threading.Lock()
+
+
+def _record(stage, seconds, error=False):
+    with _collectors_lock:
+        for collector in _collectors:
+            collector.add(stage, seconds, error)
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one call of `stage`."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        _record(stage, time.perf_counter() - start, error=True)
+        raise
+    _record(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timed_iter(stage, iterable):
+    """Yield from `iterable`, recording the time spent producing items as one call.
+
+    For streamed stages (pages from an extractor, rows from a workbook) whose
+    work happens inside next(), interleaved with the consumer's own work.
+    """
+    if not METRICS_ENABLED:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                spent += time.perf_counter() - start
+                break
+            spent += time.perf_counter() - start
+            yield item
+    finally:
+        _record(stage, spent)
+
+
+def record_many(samples):
+    """Replay {stage: [seconds, ...]} collected in another process."""
+    for stage, durations in samples.items():
+        for seconds in durations:
+            _record(stage, seconds)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class JobMetrics:
+    """Collect every span recorded between start() and finish().
+
+    With a `prefix`, finish() writes <prefix>.metrics.json (and <prefix>.prom
+    when Prometheus output is on) plus <prefix>.profile.folded when the
+    sampling profiler ran.
+    """
+
+    def __init__(self, prefix=None, labels=None, profile=None):
+        self.prefix = prefix
+        self.labels = labels or {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._errors = Counter()
+        self._totals = defaultdict(float)
+        self._samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_STAGE))
+        self._profiler = SamplingProfiler() if (
+            PROFILE_SAMPLING if profile is None else profile) else None
+
+    def start(self):
+        with _collectors_lock:
+            _collectors.append(self)
+        if self._profiler:
+            self._profiler.start()
+        return self
+
+    def close(self):
+        """Stop collecting without writing anything."""
+        with _collectors_lock:
+            if self in _collectors:
+                _collectors.remove(self)
+        if self._profiler:
+            self._profiler.stop()
+
+    def finish(self):
+        """Stop collecting and write the job's files; returns the summary."""
+        self.close()
+        stages = self.summary()
+        if not self.prefix:
+            return stages
+        try:
+            _write_atomically(f"{self.prefix}.metrics.json", json.dumps({
+                **self.labels,
+                "started": self.started,
+                "finished": time.time(),
+                "stages": stages,
+            }, indent=2))
+            if METRICS_PROMETHEUS:
+                _write_atomically(f"{self.prefix}.prom", prometheus_text(stages, self.labels))
+            if self._profiler:
+                self._profiler.write(f"{self.prefix}.profile.folded")
+        except OSError as e:
+            # Metrics must never fail the job they describe
+            logger.warning(f"Could not write metrics for {self.prefix}: {e}")
+        return stages
+
+    def add(self, stage, seconds, error=False):
+        with self._lock:
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+            self._samples[stage].append(seconds)
+            if error:
+                self._errors[stage] += 1
+
+    def raw_samples(self):
+        """{stage: [seconds, ...]}, for sending to a parent process."""
+        with self._lock:
+            return {stage: list(samples) for stage, samples in self._samples.items()}
+
+    def summary(self):
+        """Count, errors, total, mean and percentiles (seconds) per stage."""
+        with self._lock:
+            stages = {}
+            for stage in sorted(self._counts):
+                ordered = sorted(self._samples[stage])
+                count = self._counts[stage]
+                stages[stage] = {
+                    "count": count,
+                    "errors": self._errors[stage],
+                    "total_s": round(self._totals[stage], 4),
+                    "mean_s": round(self._totals[stage] / count, 4),
+                    "p50_s": round(_percentile(ordered, 0.50), 4),
+                    "p95_s": round(_percentile(ordered, 0.95), 4),
+                    "p99_s": round(_percentile(ordered, 0.99), 4),
+                    "max_s": round(ordered[-1], 4),
+                }
+            return stages
+
+
+def _write_atomically(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# ============================
+# 🔹 Prometheus Textfile Export
+# ============================
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    return ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items())
+
+
+def prometheus_text(stages, labels=None):
+    """Render a summary in the Prometheus text exposition format."""
+    labels = labels or {}
+    lines = [
+        "# HELP essaybot_stage_seconds Per-call duration of a pipeline stage.",
+        "# TYPE essaybot_stage_seconds summary",
+    ]
+    for stage, stats in stages.items():
+        base = {**labels, "stage": stage}
+        for quantile, key in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+            lines.append(
+                f"essaybot_stage_seconds{{{_label_text({**base, 'quantile': quantile})}}} {stats[key]}")
+        lines.append(f"essaybot_stage_seconds_sum{{{_label_text(base)}}} {stats['total_s']}")
+        lines.append(f"essaybot_stage_seconds_count{{{_label_text(base)}}} {stats['count']}")
+    lines += [
+        "# HELP essaybot_stage_errors_total Calls of a pipeline stage that raised.",
+        "# TYPE essaybot_stage_errors_total counter",
+    ]
+    for stage, stats in stages.items():
+        lines.append(
+            f"essaybot_stage_errors_total{{{_label_text({**labels, 'stage': stage})}}} {stats['errors']}")
+    return "\n".join(lines) + "\n"
+
+
+# ============================
+# 🔹 Sampling Profiler
+# ============================
+# A background thread snapshots every thread's stack with
+# sys._current_frames() and counts identical stacks. The output is in the
+# "collapsed" format (frame;frame;frame count) that flamegraph.pl and
+# speedscope read. PROFILE_SAMPLING=1 (or script.py --profile) turns it on.
+
+PROFILE_SAMPLING = os.environ.get("PROFILE_SAMPLING", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "10"))
+
+
+class SamplingProfiler:
+    """Sample all threads' stacks every `interval_ms` until stop()."""
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def write(self, path):
+        """Write collapsed stacks, most frequent first."""
+        _write_atomically(path, "".join(
+            f"{stack} {count}\n" for stack, count in self._stacks.most_common()))
+        logger.info(f"Wrote {self.samples} profiler samples to {path}")
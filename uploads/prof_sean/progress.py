@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+import llm_client
+
+# ============================
+# 🔹 Atomic Status Files
+# ============================
+# The Node status route reads `<job-id>.status` while a job is running. A
+# status is written to a temp file in the same directory and renamed over
+# the old one, so a reader always sees either the previous or the new
+# status, never a truncated file.
+
+
+def write_status(path, status):
+    """Atomically replace the status file at `path` with `status`."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def read_status(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ============================
+# 🔹 Job Progress
+# ============================
+# Throughput and ETA count only essays graded by this run, so a resumed job
+# doesn't report the journaled rows as instant. Retries are the change in the
+# process-wide llm_client counters since the job started; in a worker running
+# several jobs at once they include the other jobs' retries.
+
+LATENCY_WINDOW = 1000  # recent per-essay latencies kept for mean/p95
+
+
+class JobProgress:
+    """Track a grading job and publish its status; `status_path=None` only tracks."""
+
+    def __init__(self, status_path, total=0, completed=0):
+        self.status_path = status_path
+        self.total = total
+        self.completed = completed
+        self._resumed = completed
+        self._started = time.time()
+        self._clock = time.perf_counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        stats = llm_client.get_stats()
+        self._retries_at_start = (stats["transport_retries"], stats["output_retries"])
+
+    def record_latency(self, seconds):
+        """Record how long one essay took to grade (safe from worker threads)."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def essay_done(self):
+        """Count one finished essay and publish the new status."""
+        self.completed += 1
+        self.publish("processing")
+
+    def snapshot(self):
+        """Progress, throughput, latency, retries and ETA as a status dict."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        elapsed = time.perf_counter() - self._clock
+        graded = self.completed - self._resumed
+        rate = graded / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.completed, 0)
+        stats = llm_client.get_stats()
+
+        snapshot = {
+            "progress": min(int(self.completed / max(self.total, 1) * 100), 100),
+            "rowCount": self.total,
+            "completed": self.completed,
+            "startedAt": self._started,
+            "updatedAt": time.time(),
+            "elapsedSeconds": round(elapsed, 1),
+            "essaysPerSec": round(rate, 4),
+            "etaSeconds": round(remaining / rate, 1) if rate else None,
+            "retries": {
+                "transport": stats["transport_retries"] - self._retries_at_start[0],
+                "output": stats["output_retries"] - self._retries_at_start[1],
+            },
+        }
+        if latencies:
+            snapshot["latencyMeanSeconds"] = round(sum(latencies) / len(latencies), 3)
+            snapshot["latencyP95Seconds"] = round(
+                latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+        return snapshot
+
+    def publish(self, status, **extra):
+        """Write the current snapshot with a status and any extra fields."""
+        if self.status_path:
+            write_status(self.status_path, {"status": status, **self.snapshot(), **extra})
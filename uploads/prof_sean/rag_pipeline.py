@@ -4,11 +4,23 @@ import pickle
 import logging
 import argparse
 import json
+import time
+import fcntl
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, closing, nullcontext
 from PyPDF2 import PdfReader
 from docx import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import faiss
+import numpy as np
+import ingest_cache
+import metrics
 
 # ============================
 # 🔹 Setup Logging
@@ -62,34 +74,97 @@ def get_professor_directories(professor_username, project_root):
 def get_indices_path(professor_username, project_root):
     """Get FAISS indices path for a professor."""
     directories = get_professor_directories(professor_username, project_root)
-    return os.path.join(directories["indices"], "faiss_index.pkl")
+    return os.path.join(directories["indices"], "faiss_index.faiss")
+
+
+def get_store_paths(indices_path):
+    """Map an index path to its sidecar files (chunk texts, metadata, legacy pickle)."""
+    base = os.path.splitext(indices_path)[0]
+    return {
+        "index": indices_path,
+        "chunks": f"{base}.chunks.jsonl",
+        "meta": f"{base}.meta.json",
+        "manifest": f"{base}.manifest.json",
+        "lock": f"{base}.lock",
+        "ingest_cache": os.path.join(os.path.dirname(indices_path), "ingest_cache.sqlite"),
+        "legacy_pickle": f"{base}.pkl",
+    }
 
 # ============================
 # 🔹 Load Course Materials
 # ============================
 
 
-def extract_text(file_path):
-    """Extracts text from PDF, DOCX, or TXT files."""
+# Pages are extracted once each and streamed: a textbook never has to sit in
+# memory as a single string. PDF page ranges are extracted in a process pool
+# (PyPDF2 is pure Python, so threads would serialize on the GIL) and yielded
+# back in page order.
+
+PDF_EXTRACT_WORKERS = int(os.environ.get(
+    "PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "16"))
+
+
+def _extract_pdf_pages(task):
+    """Extract one range of PDF pages as (page_number, text) pairs."""
+    file_path, start, stop = task
+    reader = PdfReader(file_path)
+    return [(number + 1, reader.pages[number].extract_text() or "")
+            for number in range(start, stop)]
+
+
+def _iter_pdf_pages(file_path, workers):
+    page_count = len(PdfReader(file_path).pages)
+    tasks = [(file_path, start, min(start + PDF_PAGES_PER_TASK, page_count))
+             for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield from _extract_pdf_pages(task)
+        return
+
+    # Keep a bounded window of ranges in flight so a slow consumer
+    # doesn't let extracted pages pile up in memory
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_extract_pdf_pages, task))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_pages(file_path, workers=None):
+    """Yield (page_number, text) for each non-empty page of a PDF, DOCX, or TXT file.
+
+    DOCX and TXT files have no pages, so their paragraphs or lines are
+    yielded with a page number of None.
+    """
     logger.info(f"Extracting text from: {file_path}")
 
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
     file_extension = os.path.splitext(file_path)[1].lower()
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
 
     try:
         if file_extension == '.pdf':
-            reader = PdfReader(file_path)
-            return "\n".join(page.extract_text() for page in reader.pages if page.extract_text())
+            for page_number, text in _iter_pdf_pages(file_path, workers):
+                if text:
+                    yield page_number, text
 
         elif file_extension == '.docx':
             doc = Document(file_path)
-            return "\n".join(paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip())
+            for paragraph in doc.paragraphs:
+                if paragraph.text.strip():
+                    yield None, paragraph.text
 
         elif file_extension == '.txt':
             with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+                for line in file:
+                    yield None, line.rstrip("\n")
 
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
@@ -98,34 +173,790 @@ def extract_text(file_path):
         logger.error(f"Error extracting text from {file_path}: {e}")
         raise
 
+
+@metrics.timed("rag.extract_text")
+def extract_text(file_path):
+    """Extracts text from PDF, DOCX, or TXT files."""
+    return "\n".join(text for _, text in iter_pages(file_path))
+
+
+# ============================
+# 🔹 Embedding Provider
+# ============================
+# bge-large weighs ~1.3 GB, so each model is loaded once per process and
+# shared by indexing (embed_texts) and retrieval (embed_query). New indexes
+# use EMBEDDING_MODEL; an existing index keeps the model in its metadata.
+# A model named "<prefix>:<spec>" is built by the provider registered for
+# <prefix> instead of HuggingFace (e.g. the benchmarks' offline hash embedder).
+
+DEFAULT_EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "BAAI/bge-large-en")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0"))  # 0 = torch default
+
+_embedding_models = {}
+_embedding_lock = threading.Lock()
+_embedding_stats = {}  # model_name -> load time and encode throughput
+_embedding_providers = {}  # model name prefix -> factory(model_name)
+
+
+def register_embedding_provider(prefix, factory):
+    """Build models named "<prefix>:<spec>" with factory(model_name).
+
+    The factory returns an object with LangChain's embed_documents and
+    embed_query methods.
+    """
+    with _embedding_lock:
+        _embedding_providers[prefix] = factory
+
+
+def get_embeddings(model_name=DEFAULT_EMBEDDING_MODEL):
+    """Return the process-wide embedding model, loading it on first use."""
+    with _embedding_lock:
+        if model_name not in _embedding_models:
+            if EMBEDDING_THREADS:
+                import torch
+                torch.set_num_threads(EMBEDDING_THREADS)
+
+            start = time.perf_counter()
+            provider = _embedding_providers.get(model_name.split(":", 1)[0])
+            if provider and ":" in model_name:
+                _embedding_models[model_name] = provider(model_name)
+            else:
+                _embedding_models[model_name] = HuggingFaceEmbeddings(
+                    model_name=model_name,
+                    encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE})
+            load_seconds = time.perf_counter() - start
+
+            _embedding_stats[model_name] = {
+                "load_seconds": round(load_seconds, 3),
+                "texts_encoded": 0,
+                "encode_seconds": 0.0,
+            }
+            logger.info(
+                f"Loaded embedding model {model_name} in {load_seconds:.2f}s")
+        return _embedding_models[model_name]
+
+
+def _record_encode(model_name, count, seconds):
+    with _embedding_lock:
+        stats = _embedding_stats[model_name]
+        stats["texts_encoded"] += count
+        stats["encode_seconds"] += seconds
+
+
+@metrics.timed("rag.embed")
+def embed_texts(texts, model_name=DEFAULT_EMBEDDING_MODEL):
+    """Embed a list of texts as a float32 matrix, one row per text."""
+    texts = list(texts)
+    embeddings_model = get_embeddings(model_name)
+
+    start = time.perf_counter()
+    vectors = np.asarray(
+        embeddings_model.embed_documents(texts), dtype="float32")
+    seconds = time.perf_counter() - start
+    _record_encode(model_name, len(texts), seconds)
+
+    logger.info(
+        f"Embedded {len(texts)} texts in {seconds:.2f}s ({len(texts) / max(seconds, 1e-9):.1f} texts/s)")
+    return vectors
+
+
+@metrics.timed("rag.embed_query")
+def embed_query(query, model_name=DEFAULT_EMBEDDING_MODEL):
+    """Embed a single retrieval query."""
+    embeddings_model = get_embeddings(model_name)
+
+    start = time.perf_counter()
+    vector = np.asarray(embeddings_model.embed_query(query), dtype="float32")
+    _record_encode(model_name, 1, time.perf_counter() - start)
+    return vector
+
+
+def embed_chunks(texts, model_name=DEFAULT_EMBEDDING_MODEL, cache=None):
+    """Embed chunks, reusing vectors from the ingestion cache where possible."""
+    texts = list(texts)
+    if cache is None:
+        return embed_texts(texts, model_name)
+
+    hashes = [ingest_cache.text_sha256(text) for text in texts]
+    vectors_by_hash = ingest_cache.get_embeddings(cache, model_name, hashes)
+
+    missing = {}
+    for chunk_hash, text in zip(hashes, texts):
+        if chunk_hash not in vectors_by_hash:
+            missing[chunk_hash] = text
+    logger.info(
+        f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} chunks cached")
+
+    if missing:
+        new_vectors = embed_texts(list(missing.values()), model_name)
+        new_by_hash = dict(zip(missing.keys(), new_vectors))
+        ingest_cache.put_embeddings(cache, model_name, new_by_hash)
+        vectors_by_hash.update(new_by_hash)
+
+    return np.vstack([vectors_by_hash[chunk_hash] for chunk_hash in hashes])
+
+
+def get_embedding_stats():
+    """Return load time and encode throughput for each loaded model."""
+    with _embedding_lock:
+        report = {}
+        for model_name, stats in _embedding_stats.items():
+            report[model_name] = {
+                **stats,
+                "encode_seconds": round(stats["encode_seconds"], 3),
+                "texts_per_second": round(
+                    stats["texts_encoded"] / stats["encode_seconds"], 1) if stats["encode_seconds"] else None,
+            }
+        return report
+
 # ============================
 # 🔹 FAISS Vector Store Handling
 # ============================
 
 
-def create_faiss_index(text_chunks, indices_path):
-    """Creates and saves FAISS vector store using BAAI/bge-large-en embeddings."""
+# On-disk format:
+#   faiss_index.faiss          raw index written with faiss.write_index
+#                              (IndexIDMap2 over Flat/HNSW, or IndexIVFFlat)
+#   faiss_index.chunks.jsonl   {"id", "text", "source", "page"} per vector
+#   faiss_index.meta.json      embedding model, dimension, count, index type
+#   faiss_index.manifest.json  source file -> content hash and vector IDs
+# Stable vector IDs plus the manifest let one document be added or removed
+# without re-embedding the others. Nothing is unpickled on load, and the
+# index is memory-mapped read-only so grading processes share its pages.
+
+STORE_FORMAT_VERSION = 2
+LEGACY_SOURCE = "(legacy)"  # Chunks from indexes built before the manifest
+
+
+def file_sha256(file_path):
+    """Hash a file's content in blocks so large PDFs are never fully in memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _replace_atomically(path, write):
+    """Write a file via a temporary sibling and rename it into place."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def index_write_lock(indices_path):
+    """Serialize index updates across processes (uploads, deletes, rebuilds)."""
+    lock_path = get_store_paths(indices_path)["lock"]
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def empty_faiss_store(embedding_model=DEFAULT_EMBEDDING_MODEL):
+    """A store with no vectors; the index is created when the first vectors arrive."""
+    return {
+        "index": None,
+        "chunks": {},
+        "meta": {"embedding_model": embedding_model},
+        "manifest": {"next_id": 0, "documents": {}},
+    }
+
+
+# ============================
+# 🔹 Index Types
+# ============================
+# "flat" is exact search; its cost grows linearly with the corpus. "ivf"
+# (IVF-Flat) clusters vectors into nlist lists, is trained on the vectors
+# it is built from, and scans nprobe lists per query. "hnsw" is a graph
+# index with the lowest latency at high recall, but it can't delete
+# vectors, so removals rebuild it. "auto" picks flat below
+# FLAT_MAX_VECTORS and IVF-Flat above (IVF keeps cheap removals).
+# Every type stores its vectors, so a rebuild (on a type change, or once an
+# IVF index has grown or shrunk 4x past its training size) reuses them
+# without re-embedding anything.
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "auto")
+FLAT_MAX_VECTORS = int(os.environ.get("FLAT_MAX_VECTORS", "20000"))
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", "0"))  # 0 = nlist / 16, at least 8
+IVF_TRAINING_POINTS_PER_LIST = 256
+HNSW_M = int(os.environ.get("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "64"))
+
+
+def choose_index_type(vector_count, requested="auto"):
+    """The index type to build for `vector_count` vectors."""
+    if requested in INDEX_TYPES:
+        return requested
+    return "flat" if vector_count < FLAT_MAX_VECTORS else "ivf"
+
+
+def index_type_of(index):
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    inner = faiss.downcast_index(index.index) if isinstance(
+        index, faiss.IndexIDMap2) else index
+    return "hnsw" if isinstance(inner, faiss.IndexHNSW) else "flat"
+
+
+def ivf_list_count(vector_count):
+    # ~4 * sqrt(n) lists, with the 39 training points per list FAISS asks for
+    return max(1, min(int(4 * np.sqrt(vector_count)), vector_count // 39))
+
+
+def apply_search_params(index, params):
+    """Set query-time parameters (nprobe, efSearch) saved with an index."""
+    space = faiss.ParameterSpace()
+    for name, value in (params or {}).items():
+        space.set_index_parameter(index, name, value)
+
+
+def build_index(index_type, vectors, ids):
+    """Build an index of `index_type` holding `vectors`, training it first if needed.
+
+    Returns (index, meta) where meta records what the index was built as.
+    """
+    dimension = vectors.shape[1]
+    if index_type == "ivf" and len(vectors) < 39:
+        index_type = "flat"  # too few vectors to train clusters on
+
+    params = {}
+    if index_type == "ivf":
+        nlist = ivf_list_count(len(vectors))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+        sample_size = nlist * IVF_TRAINING_POINTS_PER_LIST
+        if len(vectors) > sample_size:
+            sample = np.random.default_rng(0).choice(
+                len(vectors), sample_size, replace=False)
+            index.train(vectors[np.sort(sample)])
+        else:
+            index.train(vectors)
+        # A hashtable direct map supports remove_ids and reconstruct by ID
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        params = {"nprobe": min(nlist, IVF_NPROBE or max(8, nlist // 16))}
+    elif index_type == "hnsw":
+        graph = faiss.IndexHNSWFlat(dimension, HNSW_M)
+        graph.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index = faiss.IndexIDMap2(graph)
+        params = {"efSearch": HNSW_EF_SEARCH}
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+    start = time.perf_counter()
+    index.add_with_ids(vectors, ids)
+    apply_search_params(index, params)
+    logger.info(
+        f"Built {index_type} index over {len(vectors)} vectors in {time.perf_counter() - start:.2f}s")
+    return index, {"index_type": index_type, "built_for": len(vectors), "search_params": params}
+
+
+def stored_vectors(faiss_store):
+    """(vectors, ids) for every chunk in a store, read back from its index."""
+    ids = np.asarray(sorted(faiss_store["chunks"]), dtype="int64")
+    if not len(ids):
+        return np.zeros((0, faiss_store["index"].d), dtype="float32"), ids
+    return faiss_store["index"].reconstruct_batch(ids), ids
+
+
+@metrics.timed("rag.rebuild_index")
+def _rebuild_index(faiss_store, index_type):
+    vectors, ids = stored_vectors(faiss_store)
+    if not len(ids):
+        faiss_store["index"] = faiss.IndexIDMap2(
+            faiss.IndexFlatL2(faiss_store["index"].d))
+        faiss_store["meta"].update(
+            {"index_type": "flat", "built_for": 0, "search_params": {}})
+        return
+    faiss_store["index"], built = build_index(index_type, vectors, ids)
+    faiss_store["meta"].update(built)
+
+
+def _fit_index(faiss_store):
+    """Rebuild the index if its type or training no longer suits its size."""
+    index = faiss_store["index"]
+    if index is None or not index.ntotal:
+        return False
+    meta = faiss_store["meta"]
+    wanted = choose_index_type(index.ntotal, meta.get("index_type_setting", INDEX_TYPE))
+    current = index_type_of(index)
+    built_for = meta.get("built_for") or index.ntotal
+    drifted = current == "ivf" and not built_for / 4 <= index.ntotal <= built_for * 4
+    if wanted == "ivf" and index.ntotal < 39:
+        wanted = "flat"
+    if wanted == current and not drifted:
+        return False
+    logger.info(f"Rebuilding {current} index as {wanted} for {index.ntotal} vectors")
+    _rebuild_index(faiss_store, wanted)
+    return True
+
+
+def measure_recall(faiss_store, k=5, queries=200, seed=0):
+    """recall@k of a store's index against exact search over the same vectors.
+
+    Stored vectors serve as queries; each query's own vector is dropped from
+    both result lists so self-matches don't inflate the score.
+    """
+    index = faiss_store["index"]
+    vectors, ids = stored_vectors(faiss_store)
+    if len(ids) <= k:
+        return {"index_type": index_type_of(index), "k": k, "queries": 0, "recall_at_k": 1.0}
+
+    picks = np.random.default_rng(seed).choice(
+        len(ids), min(queries, len(ids)), replace=False)
+    query_vectors = vectors[picks]
+    exact = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    exact.add_with_ids(vectors, ids)
+
+    start = time.perf_counter()
+    _, found = index.search(query_vectors, k + 1)
+    search_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    _, truth = exact.search(query_vectors, k + 1)
+    exact_seconds = time.perf_counter() - start
+
+    hits = expected = 0
+    for query_id, found_row, truth_row in zip(ids[picks], found, truth):
+        nearest = [i for i in truth_row if i != query_id][:k]
+        returned = [i for i in found_row if i not in (query_id, -1)][:k]
+        hits += len(set(nearest) & set(returned))
+        expected += len(nearest)
+
+    return {
+        "index_type": index_type_of(index),
+        "k": k,
+        "queries": len(picks),
+        "recall_at_k": round(hits / expected, 4),
+        "search_ms_per_query": round(search_seconds * 1000 / len(picks), 4),
+        "exact_ms_per_query": round(exact_seconds * 1000 / len(picks), 4),
+        "search_params": faiss_store["meta"].get("search_params", {}),
+    }
+
+
+def check_index_recall(indices_path, k=5, queries=200):
+    """Measure recall@k of the index saved at `indices_path`."""
+    report = measure_recall(read_faiss_store(indices_path, mmap=False), k, queries)
+    logger.info(f"Index recall check: {json.dumps(report)}")
+    return report
+
+
+@metrics.timed("rag.save_index")
+def save_faiss_store(faiss_store, indices_path):
+    """Persist a store's index, chunk records, metadata and manifest."""
+    paths = get_store_paths(indices_path)
+    index = faiss_store["index"]
     os.makedirs(os.path.dirname(indices_path), exist_ok=True)
 
-    embeddings_model = HuggingFaceEmbeddings(model_name="BAAI/bge-large-en")
-    faiss_store = FAISS.from_texts(text_chunks, embeddings_model)
+    def write_chunks(path):
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk_id in sorted(faiss_store["chunks"]):
+                f.write(json.dumps(
+                    {"id": chunk_id, **faiss_store["chunks"][chunk_id]}) + "\n")
+
+    def write_json(data):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(data, f)
+        return write
+
+    meta = {
+        **faiss_store["meta"],
+        "format_version": STORE_FORMAT_VERSION,
+        "dimension": index.d,
+        "count": index.ntotal,
+        "index_type": index_type_of(index),
+    }
+
+    _replace_atomically(paths["chunks"], write_chunks)
+    _replace_atomically(paths["meta"], write_json(meta))
+    _replace_atomically(paths["manifest"], write_json(faiss_store["manifest"]))
+    # The index file goes last: its mtime/size is what readers key on
+    _replace_atomically(
+        paths["index"], lambda path: faiss.write_index(index, path))
+    invalidate_index_cache(indices_path)
+
+
+def _upgrade_to_id_map(faiss_store):
+    """Give a positional (pre-manifest) index stable IDs so it can be updated."""
+    index = faiss_store["index"]
+    if isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+        return
+
+    vectors = index.reconstruct_n(0, index.ntotal)
+    ids = np.arange(index.ntotal, dtype="int64")
+    upgraded = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    upgraded.add_with_ids(vectors, ids)
+
+    faiss_store["index"] = upgraded
+    faiss_store["manifest"] = {
+        "next_id": int(index.ntotal),
+        "documents": {LEGACY_SOURCE: {"sha256": None, "ids": ids.tolist()}},
+    }
+
+
+def _remove_document(faiss_store, source):
+    """Drop one source file's manifest entry and chunk records; return its vector IDs.
+
+    The vectors themselves are dropped by _drop_vectors, once per update.
+    """
+    document = faiss_store["manifest"]["documents"].pop(source, None)
+    if not document:
+        return []
+
+    for chunk_id in document["ids"]:
+        faiss_store["chunks"].pop(chunk_id, None)
+    return document["ids"]
+
+
+def _drop_vectors(faiss_store, ids):
+    """Remove vectors from the index; returns True if that meant a full rebuild."""
+    if not ids:
+        return False
+    if index_type_of(faiss_store["index"]) == "hnsw":
+        # HNSW can't delete; rebuild from the chunks that remain
+        _rebuild_index(faiss_store, "hnsw")
+        return True
+    faiss_store["index"].remove_ids(np.asarray(ids, dtype="int64"))
+    return False
+
+
+# Chunks are embedded and added to the index this many at a time, so only
+# one batch of vectors is held outside the index however large the upload
+INDEX_ADD_BATCH_SIZE = int(os.environ.get("INDEX_ADD_BATCH_SIZE", "1024"))
+
+
+def _add_documents(faiss_store, documents, cache=None):
+    """Embed and append documents ({"source", "sha256", "chunks"}) to a store.
+
+    Chunks are {"text", "page"} dicts as produced by iter_chunks. They are
+    embedded and added in batches of INDEX_ADD_BATCH_SIZE.
+    """
+    documents = [document for document in documents if document["chunks"]]
+    total = sum(len(document["chunks"]) for document in documents)
+    if not total:
+        return 0
 
-    with open(indices_path, "wb") as f:
-        pickle.dump(faiss_store, f)
+    meta = faiss_store["meta"]
+    manifest = faiss_store["manifest"]
+    next_id = manifest["next_id"]
+    texts = (chunk["text"]
+             for document in documents for chunk in document["chunks"])
+    position = next_id
+    while True:
+        batch = list(islice(texts, INDEX_ADD_BATCH_SIZE))
+        if not batch:
+            break
+        vectors = embed_chunks(batch, meta["embedding_model"], cache)
+        ids = np.arange(position, position + len(batch), dtype="int64")
+        if faiss_store["index"] is None:
+            index_type = choose_index_type(
+                total, meta.get("index_type_setting", INDEX_TYPE))
+            # IVF trains on the whole corpus, so it starts flat and
+            # _fit_index converts it once every batch has been added
+            faiss_store["index"], built = build_index(
+                "flat" if index_type == "ivf" else index_type, vectors, ids)
+            meta.update(built)
+        else:
+            faiss_store["index"].add_with_ids(vectors, ids)
+        position += len(batch)
+
+    chunk_id = next_id
+    for document in documents:
+        document_ids = list(range(chunk_id, chunk_id + len(document["chunks"])))
+        for document_id, chunk in zip(document_ids, document["chunks"]):
+            faiss_store["chunks"][document_id] = {
+                "text": chunk["text"],
+                "source": document["source"],
+                "page": chunk.get("page"),
+            }
+        manifest["documents"][document["source"]] = {
+            "sha256": document["sha256"],
+            "ids": document_ids,
+        }
+        chunk_id += len(document["chunks"])
+
+    manifest["next_id"] = next_id + total
+    return total
+
+
+@contextmanager
+def closing_cache(indices_path):
+    """Open the professor's ingestion cache (None when disabled) and trim it on exit."""
+    cache = ingest_cache.connect(get_store_paths(indices_path)["ingest_cache"])
+    if cache is None:
+        yield None
+        return
+    with closing(cache):
+        yield cache
+        ingest_cache.evict(cache)
+
+
+def read_manifest(indices_path):
+    """Return the source-file manifest, or an empty one if nothing is indexed."""
+    manifest_path = get_store_paths(indices_path)["manifest"]
+    if not os.path.exists(manifest_path):
+        return {"next_id": 0, "documents": {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+@metrics.timed("rag.update_index")
+def update_faiss_index(indices_path, add=(), remove=(), rebuild=False, index_type=None):
+    """Incrementally add and/or remove documents, embedding only the new ones.
+
+    `add` holds {"source", "sha256", "chunks"} documents; a source already
+    indexed with the same hash is skipped, and a changed one is replaced.
+    `remove` holds source names to drop. With `rebuild`, existing vectors are
+    discarded and the store is rebuilt from `add` alone. `index_type` (one
+    of INDEX_TYPES or "auto") is saved with the store and kept by later
+    updates; see Index Types.
+    """
+    with index_write_lock(indices_path):
+        if rebuild or not os.path.exists(indices_path):
+            faiss_store = empty_faiss_store()
+        else:
+            faiss_store = read_faiss_store(indices_path, mmap=False)
+            _upgrade_to_id_map(faiss_store)
+
+        meta = faiss_store["meta"]
+        changed_setting = index_type is not None and index_type != meta.get("index_type_setting")
+        meta["index_type_setting"] = index_type or meta.get(
+            "index_type_setting", INDEX_TYPE)
+
+        documents = faiss_store["manifest"]["documents"]
+        summary = {"added": [], "replaced": [], "skipped": [], "removed": []}
+        dropped = []
+
+        for source in remove:
+            ids = _remove_document(faiss_store, source)
+            if ids:
+                dropped += ids
+                summary["removed"].append(source)
+
+        pending = []
+        for document in add:
+            existing = documents.get(document["source"])
+            if existing and existing["sha256"] == document["sha256"]:
+                summary["skipped"].append(document["source"])
+                continue
+            if existing:
+                dropped += _remove_document(faiss_store, document["source"])
+                summary["replaced"].append(document["source"])
+            else:
+                summary["added"].append(document["source"])
+            pending.append(document)
+
+        rebuilt = faiss_store["index"] is not None and _drop_vectors(faiss_store, dropped)
+
+        with closing_cache(indices_path) as cache:
+            summary["vectors_added"] = _add_documents(
+                faiss_store, pending, cache)
+
+        summary["index_rebuilt"] = _fit_index(faiss_store) or rebuilt
+        if faiss_store["index"] is not None and (
+                pending or summary["removed"] or rebuild or summary["index_rebuilt"] or changed_setting):
+            save_faiss_store(faiss_store, indices_path)
+            logger.info(
+                f"Updated FAISS index at {indices_path}: {json.dumps(summary)}")
+
+        summary["vectors_total"] = faiss_store["index"].ntotal if faiss_store["index"] is not None else 0
+        if faiss_store["index"] is not None:
+            summary["index_type"] = index_type_of(faiss_store["index"])
+        return summary
+
+
+def create_faiss_index(text_chunks, indices_path, source=LEGACY_SOURCE, index_type=None):
+    """Creates and saves a fresh FAISS vector store from a list of chunks.
+
+    The index type follows `index_type`, or INDEX_TYPE ("auto" picks by size).
+    """
+    update_faiss_index(
+        indices_path,
+        add=[{"source": source, "sha256": None,
+              "chunks": [{"text": text, "page": None} for text in text_chunks]}],
+        rebuild=True, index_type=index_type)
 
     logger.info(f"FAISS vector store saved at {indices_path}")
 
 
+# IO_FLAG_MMAP only maps inverted lists (IVF); flat and HNSW vectors are
+# still copied onto the heap. IO_FLAG_MMAP_IFC (faiss >= 1.8) maps the codes
+# of every index type, so the pages stay file-backed and shared between
+# grading processes.
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def read_faiss_index(path, mmap=True):
+    """Memory-map an index read-only, falling back to a normal read if unsupported."""
+    if not mmap:
+        return faiss.read_index(path)
+    try:
+        return faiss.read_index(path, MMAP_FLAG | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        logger.warning(f"Cannot mmap FAISS index {path}, reading it instead: {e}")
+        return faiss.read_index(path)
+
+
+def convert_legacy_pickle(indices_path):
+    """One-time conversion of a pickled langchain FAISS store to the native format."""
+    pickle_path = get_store_paths(indices_path)["legacy_pickle"]
+    logger.info(f"Converting legacy FAISS pickle: {pickle_path}")
+
+    # Trusted file written by an earlier version of this pipeline
+    with open(pickle_path, "rb") as f:
+        legacy_store = pickle.load(f)
+
+    index = legacy_store.index
+    embedding_model = getattr(
+        legacy_store.embedding_function, "model_name", DEFAULT_EMBEDDING_MODEL)
+
+    # Keep the existing vectors; only the container format changes
+    faiss_store = empty_faiss_store(embedding_model)
+    faiss_store["index"] = index
+    faiss_store["chunks"] = {
+        i: {
+            "text": legacy_store.docstore.search(
+                legacy_store.index_to_docstore_id[i]).page_content,
+            "source": LEGACY_SOURCE,
+        }
+        for i in range(index.ntotal)
+    }
+    _upgrade_to_id_map(faiss_store)
+
+    with index_write_lock(indices_path):
+        save_faiss_store(faiss_store, indices_path)
+    logger.info(
+        f"Converted {index.ntotal} vectors from {pickle_path} to {indices_path}")
+
+
+def read_faiss_store(indices_path, mmap=True):
+    """Load an index, its chunk records and manifest from disk."""
+    paths = get_store_paths(indices_path)
+    with open(paths["meta"]) as f:
+        meta = json.load(f)
+
+    chunks = {}
+    with open(paths["chunks"], encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            record = json.loads(line)
+            # Format 1 stored no IDs: vector N was line N
+            chunk_id = record.pop("id", line_number)
+            record.setdefault("source", LEGACY_SOURCE)
+            chunks[chunk_id] = record
+
+    index = read_faiss_index(paths["index"], mmap=mmap)
+    apply_search_params(index, meta.get("search_params"))
+    return {
+        "index": index,
+        "chunks": chunks,
+        "meta": meta,
+        "manifest": read_manifest(indices_path),
+    }
+
+
+# ============================
+# 🔹 In-Process Index Cache
+# ============================
+# A long-lived worker can serve many professors' indices/ directories, so
+# loaded stores are kept in an LRU keyed by path and bounded by a memory
+# budget. The on-disk size of the index is used as its memory estimate.
+
+INDEX_CACHE_MAX_BYTES = int(os.environ.get(
+    "FAISS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+_index_cache = OrderedDict()  # indices_path -> (signature, nbytes, store)
+_index_cache_lock = threading.Lock()
+_index_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _index_signature(indices_path):
+    """Identify one version of an index file by its mtime and size."""
+    stat = os.stat(indices_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _evict_indices(incoming_bytes):
+    """Drop least recently used stores until the new one fits the budget."""
+    cached_bytes = sum(entry[1] for entry in _index_cache.values())
+    while _index_cache and cached_bytes + incoming_bytes > INDEX_CACHE_MAX_BYTES:
+        path, (_, nbytes, _) = _index_cache.popitem(last=False)
+        cached_bytes -= nbytes
+        _index_cache_stats["evictions"] += 1
+        logger.info(f"Evicted FAISS index from cache: {path}")
+
+
+def invalidate_index_cache(indices_path=None):
+    """Forget one cached index, or all of them when no path is given."""
+    with _index_cache_lock:
+        if indices_path is None:
+            _index_cache.clear()
+        else:
+            _index_cache.pop(indices_path, None)
+
+
+def get_index_cache_stats():
+    """Return cache hit/miss/eviction counts and current memory use."""
+    with _index_cache_lock:
+        return {
+            **_index_cache_stats,
+            "entries": len(_index_cache),
+            "bytes": sum(entry[1] for entry in _index_cache.values()),
+            "max_bytes": INDEX_CACHE_MAX_BYTES,
+        }
+
+
+@metrics.timed("rag.load_index")
 def load_faiss_index(indices_path):
-    """Loads FAISS index from storage."""
-    if os.path.exists(indices_path):
-        with open(indices_path, "rb") as f:
-            return pickle.load(f)
-    else:
-        logger.warning(f"No FAISS index found at {indices_path}")
-        return None
+    """Loads FAISS index from storage, reusing the cached copy if the file is unchanged."""
+    if not os.path.exists(indices_path):
+        if os.path.exists(get_store_paths(indices_path)["legacy_pickle"]):
+            convert_legacy_pickle(indices_path)
+        else:
+            logger.warning(f"No FAISS index found at {indices_path}")
+            return None
+
+    signature = _index_signature(indices_path)
+    with _index_cache_lock:
+        cached = _index_cache.get(indices_path)
+        if cached and cached[0] == signature:
+            _index_cache.move_to_end(indices_path)
+            _index_cache_stats["hits"] += 1
+            return cached[2]
+
+        # Missing or stale (the file was rebuilt by another process)
+        _index_cache_stats["misses"] += 1
+        _index_cache.pop(indices_path, None)
+
+        faiss_store = read_faiss_store(indices_path)
+
+        # Count the index file (mmapped pages are shared page cache, but the
+        # budget bounds what this process keeps mapped, and a non-mmap
+        # fallback read is all heap) plus the chunk texts, always on the heap
+        nbytes = signature[1] + \
+            os.path.getsize(get_store_paths(indices_path)["chunks"])
+        _evict_indices(nbytes)
+        _index_cache[indices_path] = (signature, nbytes, faiss_store)
+        logger.info(f"Loaded FAISS index into cache: {indices_path}")
+        return faiss_store
 
 
+@metrics.timed("rag.search")
+def search_faiss_store(faiss_store, query_vectors, k=5):
+    """Return the k nearest chunk texts for each query vector."""
+    query_vectors = np.asarray(query_vectors, dtype="float32")
+    _, ids = faiss_store["index"].search(query_vectors, k)
+    chunks = faiss_store["chunks"]
+    # FAISS pads with -1 when the index holds fewer than k vectors
+    return [[chunks[i]["text"] for i in row if i != -1] for row in ids]
+
+
+@metrics.timed("rag.retrieve")
 def retrieve_relevant_text(query, indices_path, k=5):
     """Retrieves relevant text from FAISS using query."""
     faiss_store = load_faiss_index(indices_path)
@@ -133,76 +964,348 @@ def retrieve_relevant_text(query, indices_path, k=5):
     if not faiss_store:
         return []
 
-    retriever = faiss_store.as_retriever(
-        search_kwargs={"k": k, "search_type": "similarity"})
-    retrieved_docs = retriever.invoke(query)
+    query_vector = embed_query(query, faiss_store["meta"]["embedding_model"])
+    return search_faiss_store(faiss_store, [query_vector], k)[0]
+
+
+@metrics.timed("rag.retrieve_batch")
+def retrieve_relevant_text_batch(queries, indices_path, k=5):
+    """Retrieves relevant text for many queries with one encode pass and one search.
 
-    return [doc.page_content for doc in retrieved_docs]
+    Returns one list of chunk texts per query, in the same order as `queries`.
+    """
+    queries = list(queries)
+    faiss_store = load_faiss_index(indices_path)
+
+    if not faiss_store or not queries:
+        return [[] for _ in queries]
+
+    query_vectors = embed_texts(
+        queries, faiss_store["meta"]["embedding_model"])
+    return search_faiss_store(faiss_store, query_vectors, k)
 
 # ============================
 # 🔹 Full Pipeline Execution
 # ============================
 
 
-def process_materials(file_path, indices_path):
-    """Extracts text, splits into chunks, embeds, and stores in FAISS."""
-    extracted_text = extract_text(file_path)
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.txt']
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+
 
+# Text is buffered up to this many characters before splitting; everything
+# but the last chunk is emitted and the tail carries into the next window
+CHUNK_WINDOW = CHUNK_SIZE * 16
+
+
+@metrics.timed("rag.split_text")
+def split_text(text):
+    """Split extracted text into overlapping chunks for embedding."""
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800, chunk_overlap=200)
-    text_chunks = text_splitter.split_text(extracted_text)
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return text_splitter.split_text(text)
+
+
+def iter_chunks(pages):
+    """Incrementally split a (page_number, text) stream into chunk dicts.
+
+    Each chunk is {"text", "page"}, where page is the page the chunk starts
+    on. The text buffered for splitting stays bounded by CHUNK_WINDOW rather
+    than the document size.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    buffer = ""
+    offsets, page_numbers = [], []  # where each page starts in the buffer
+
+    def locate(chunks):
+        cursor = 0
+        for text in chunks:
+            position = buffer.find(text, cursor)
+            if position == -1:
+                position = cursor
+            cursor = position + 1
+            page = page_numbers[max(0, bisect_right(offsets, position) - 1)]
+            yield position, {"text": text, "page": page}
+
+    for page_number, text in pages:
+        if buffer:
+            buffer += "\n"
+        offsets.append(len(buffer))
+        page_numbers.append(page_number)
+        buffer += text
+        if len(buffer) < CHUNK_WINDOW:
+            continue
+
+        with metrics.span("rag.split"):
+            located = list(locate(text_splitter.split_text(buffer)))
+        if len(located) < 2:
+            continue
+        for _, chunk in located[:-1]:
+            yield chunk
+
+        # Carry the last chunk forward so it can grow with the next page
+        tail_start, tail = located[-1]
+        keep = bisect_right(offsets, tail_start) - 1
+        offsets = [0] + [offset - tail_start for offset in offsets[keep + 1:]]
+        page_numbers = [tail["page"]] + page_numbers[keep + 1:]
+        buffer = buffer[tail_start:]
+
+    if buffer:
+        with metrics.span("rag.split"):
+            located = list(locate(text_splitter.split_text(buffer)))
+        for _, chunk in located:
+            yield chunk
+
+
+def load_document(file_path, sha256=None, cache=None, workers=None):
+    """Extract and chunk one file into an index document.
+
+    Pages stream straight from the extractor into the chunker; the chunk
+    list itself is kept, since its text is stored with the index. With an
+    ingestion cache, unchanged files skip extraction and splitting.
+    """
+    sha256 = sha256 or file_sha256(file_path)
+    text_length = 0
+
+    def measured(pages):
+        nonlocal text_length
+        for page_number, text in pages:
+            text_length += len(text) + 1
+            yield page_number, text
+
+    cached = ingest_cache.get_pages(cache, sha256) if cache else None
+    if cached is not None:
+        text_hash, cached_pages = cached
+        chunks = ingest_cache.get_chunks(
+            cache, text_hash, CHUNK_SIZE, CHUNK_OVERLAP)
+        if chunks is None:
+            chunks = list(iter_chunks(measured(cached_pages())))
+            ingest_cache.put_chunks(
+                cache, text_hash, CHUNK_SIZE, CHUNK_OVERLAP, chunks)
+        else:
+            text_length = sum(len(text) + 1 for _, text in cached_pages())
+    else:
+        pages = measured(metrics.timed_iter(
+            "rag.extract", iter_pages(file_path, workers)))
+        recorder = ingest_cache.PageRecorder(pages) if cache else None
+        chunks = list(iter_chunks(recorder if cache else pages))
+        if cache:
+            ingest_cache.put_pages(cache, sha256, recorder)
+            ingest_cache.put_chunks(
+                cache, recorder.text_hash, CHUNK_SIZE, CHUNK_OVERLAP, chunks)
+
+    return {
+        "source": os.path.basename(file_path),
+        "sha256": sha256,
+        "chunks": chunks,
+        "text_length": max(0, text_length - 1),
+    }
+
 
-    create_faiss_index(text_chunks, indices_path)
+def process_materials(file_path, indices_path, index_type=None):
+    """Extracts text, splits into chunks, embeds, and adds to the FAISS index.
+
+    Other documents already in the index are kept; re-uploading an unchanged
+    file is a no-op (unless `index_type` is given) and a changed file
+    replaces its previous vectors.
+    """
+    source = os.path.basename(file_path)
+    sha256 = file_sha256(file_path)
+
+    indexed = read_manifest(indices_path)["documents"].get(source)
+    if indexed and indexed["sha256"] == sha256 and index_type is None:
+        logger.info(f"{source} is already indexed, skipping")
+        return {
+            "success": True,
+            "message": "Already indexed",
+            "text_chunks": len(indexed["ids"]),
+            "stats": {"index": {"skipped": [source]}}
+        }
+
+    with closing_cache(indices_path) as cache:
+        document = load_document(file_path, sha256, cache)
+    summary = update_faiss_index(
+        indices_path, add=[document], index_type=index_type)
 
     return {
         "success": True,
         "message": "Processed successfully",
-        "text_chunks": len(text_chunks),
-        "total_text_length": len(extracted_text)
+        "text_chunks": len(document["chunks"]),
+        "total_text_length": document["text_length"],
+        "stats": {"embedding": get_embedding_stats(), "index": summary}
     }
 
 
-def process_directory(directory_path, indices_path):
-    """Processes all files in a directory."""
+# Files are extracted and chunked one per worker process; pages within a
+# file are then extracted serially so the two pools don't nest
+DOCUMENT_WORKERS = int(os.environ.get(
+    "DOCUMENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def _load_document_task(task):
+    """Worker entry point: load one file with its own cache connection."""
+    file_path, sha256, cache_path = task
+    start = time.perf_counter()
+    # Spans in a pool process are sent back for the parent to replay
+    task_metrics = metrics.JobMetrics(profile=False).start()
+    try:
+        with closing(ingest_cache.connect(cache_path)) if cache_path else nullcontext() as cache:
+            document = load_document(file_path, sha256, cache, workers=1)
+    finally:
+        task_metrics.close()
+    document["timings"] = {
+        "extract_chunk_s": round(time.perf_counter() - start, 3)}
+    document["metrics"] = task_metrics.raw_samples()
+    return document
+
+
+def load_documents(tasks, workers=DOCUMENT_WORKERS):
+    """Load (file_path, sha256, cache_path) tasks, in parallel when worthwhile.
+
+    Yields (file_path, document or exception) in task order; a failed file
+    doesn't stop the others.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            try:
+                document = _load_document_task(task)
+            except Exception as e:
+                yield task[0], e
+                continue
+            # Already recorded in this process
+            document.pop("metrics")
+            yield task[0], document
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = [executor.submit(_load_document_task, task)
+                   for task in tasks]
+        for task, future in zip(tasks, futures):
+            try:
+                document = future.result()
+            except Exception as e:
+                yield task[0], e
+                continue
+            metrics.record_many(document.pop("metrics"))
+            yield task[0], document
+
+
+def process_directory(directory_path, indices_path, rebuild=False, index_type=None):
+    """Syncs the index with a directory: embeds new or changed files, drops deleted ones.
+
+    New and changed files are extracted and chunked in parallel, each into
+    its own document so chunks never span two files, then embedded together
+    in batches of INDEX_ADD_BATCH_SIZE. With `rebuild`, every file is re-indexed from scratch.
+    """
     if not os.path.isdir(directory_path):
         raise NotADirectoryError(f"Expected a directory: {directory_path}")
 
-    all_text = []
-    for filename in os.listdir(directory_path):
+    indexed = {} if rebuild else read_manifest(indices_path)["documents"]
+    cache_path = get_store_paths(
+        indices_path)["ingest_cache"] if ingest_cache.INGEST_CACHE_ENABLED else None
+    sources = set()
+    tasks = []
+    for filename in sorted(os.listdir(directory_path)):
         ext = os.path.splitext(filename)[1].lower()
-        if ext in ['.pdf', '.docx', '.txt']:
+        if ext in SUPPORTED_EXTENSIONS:
             try:
                 file_path = os.path.join(directory_path, filename)
-                all_text.append(extract_text(file_path))
+                sha256 = file_sha256(file_path)
+                sources.add(filename)
+                if filename in indexed and indexed[filename]["sha256"] == sha256:
+                    continue
+                tasks.append((file_path, sha256, cache_path))
             except Exception as e:
                 logger.error(f"Error processing file {filename}: {e}")
 
-    if not all_text:
+    if not sources:
         raise ValueError("No valid documents found in directory")
 
-    combined_text = "\n\n".join(all_text)
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800, chunk_overlap=200)
-    text_chunks = text_splitter.split_text(combined_text)
+    start = time.perf_counter()
+    documents = []
+    files = {}
+    for file_path, result in load_documents(tasks):
+        filename = os.path.basename(file_path)
+        if isinstance(result, Exception):
+            logger.error(f"Error processing file {filename}: {result}")
+            files[filename] = {"error": str(result)}
+            continue
+        documents.append(result)
+        files[filename] = {
+            **result.pop("timings"),
+            "chunks": len(result["chunks"]),
+            "text_length": result["text_length"],
+        }
+    extract_seconds = time.perf_counter() - start
 
-    create_faiss_index(text_chunks, indices_path)
+    removed = [source for source in indexed if source not in sources]
+    start = time.perf_counter()
+    summary = update_faiss_index(
+        indices_path, add=documents, remove=removed, rebuild=rebuild, index_type=index_type)
+    index_seconds = time.perf_counter() - start
 
-    return {"success": True, "message": "Directory processed successfully"}
+    return {
+        "success": True,
+        "message": "Directory processed successfully",
+        "text_chunks": sum(len(document["chunks"]) for document in documents),
+        "stats": {
+            "embedding": get_embedding_stats(),
+            "index": summary,
+            "files": files,
+            "timings": {
+                "extract_chunk_s": round(extract_seconds, 3),
+                "embed_index_s": round(index_seconds, 3),
+                "document_workers": DOCUMENT_WORKERS,
+            },
+        }
+    }
 
 
-def initialize_rag_pipeline(file_path, professor_username, project_root):
-    """Initializes RAG pipeline and processes input file or directory."""
+def remove_material(source, indices_path):
+    """Removes a deleted course material's vectors from the index."""
+    summary = update_faiss_index(
+        indices_path, remove=[os.path.basename(source)])
+    return {
+        "success": True,
+        "message": "Removed from index" if summary["removed"] else "Not indexed",
+        "stats": {"index": summary}
+    }
+
+
+def initialize_rag_pipeline(file_path, professor_username, project_root, rebuild=False, remove=None,
+                            index_type=None, recall_check=False):
+    """Initializes RAG pipeline and processes input file or directory.
+
+    With `recall_check`, the updated index's recall@k against exact search is
+    added to the result's stats.
+    """
     logger = setup_logging(professor_username)
 
-    if not project_root or not file_path:
+    if not project_root or not (file_path or remove):
         raise ValueError("File path and project root must be provided.")
 
     indices_path = get_indices_path(professor_username, project_root)
 
-    if os.path.isdir(file_path):
-        return process_directory(file_path, indices_path)
-    else:
-        return process_materials(file_path, indices_path)
+    # Stage timings go to indices/ingest.metrics.json and into the result
+    job_metrics = metrics.JobMetrics(
+        os.path.join(os.path.dirname(indices_path), "ingest"),
+        {"professor": professor_username}).start()
+    try:
+        if remove:
+            result = remove_material(remove, indices_path)
+        elif os.path.isdir(file_path):
+            result = process_directory(
+                file_path, indices_path, rebuild=rebuild, index_type=index_type)
+        else:
+            result = process_materials(file_path, indices_path, index_type=index_type)
+        if recall_check and os.path.exists(indices_path):
+            result.setdefault("stats", {})["recall"] = check_index_recall(indices_path)
+    finally:
+        stages = job_metrics.finish()
+    result.setdefault("stats", {})["stages"] = stages
+    return result
 
 # ============================
 # 🔹 CLI Handling
@@ -214,10 +1317,21 @@ def parse_arguments():
     parser = argparse.ArgumentParser(
         description="RAG Pipeline for Course Materials")
     parser.add_argument(
-        "file", help="Path to the course material file or directory")
+        "file", nargs="?", help="Path to the course material file or directory")
+    # The Node helper passes the path as --file
+    parser.add_argument("--file", dest="file_option",
+                        help="Same as the positional file argument")
     parser.add_argument("--professorUsername",
                         help="Professor username (for multi-professor support)")
     parser.add_argument("--projectRoot", help="Absolute path to project root")
+    parser.add_argument("--remove", metavar="FILENAME",
+                        help="Remove a course material's vectors from the index")
+    parser.add_argument("--reinitialize", action="store_true",
+                        help="Rebuild the index from scratch instead of updating it")
+    parser.add_argument("--index-type", choices=("auto",) + INDEX_TYPES,
+                        help="FAISS index type; auto picks by corpus size (default: INDEX_TYPE env or auto)")
+    parser.add_argument("--recall-check", action="store_true",
+                        help="Report the index's recall@k against exact search")
     return parser.parse_args()
 
 
@@ -225,7 +1339,9 @@ def main():
     """Main script execution."""
     args = parse_arguments()
     result = initialize_rag_pipeline(
-        args.file, args.professorUsername, args.projectRoot)
+        args.file or args.file_option, args.professorUsername, args.projectRoot,
+        rebuild=args.reinitialize, remove=args.remove,
+        index_type=args.index_type, recall_check=args.recall_check)
     print(json.dumps(result))
     sys.exit(0 if result["success"] else 1)
 
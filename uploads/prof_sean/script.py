@@ -1,15 +1,23 @@
 # Import required libraries
-import pandas as pd
 import json  # For JSON formatting
-import re  # For cleaning JSON output
 import logging  # For tracking and debugging
-import requests  # For HTTP requests
-import time
 import argparse  # For parsing command-line arguments
 import os  # For file path operations
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED  # For concurrent grading
 # ✅ Import RAG functions
-from rag_pipeline import initialize_rag_pipeline, retrieve_relevant_text
-from agents import agent_1_prompt, agent_2_prompt, agent_3_prompt, agent_4_prompt
+from rag_pipeline import get_indices_path, retrieve_relevant_text, retrieve_relevant_text_batch
+from agents import agent_1_prompt, agent_2_prompt, agent_3_prompt, agent_4_prompt, combined_prompt, CRITERION_KEYS, PROMPT_SUFFIX
+from agents import feedback_schema, combined_feedback_schema
+from json_extract import extract_json_object
+import llm_client  # Shared pooled HTTP client for LLM calls
+import llm_cache  # On-disk cache of LLM replies
+import excel_io  # Streaming workbook reader/writer
+import job_journal  # Per-essay journal for resumable jobs
+import progress  # Atomic job status with throughput and ETA
+import metrics  # Per-stage timing spans and the sampling profiler
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,21 +29,108 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global configuration for API requests
-session = requests.Session()  # Persistent HTTP session
-API_URL = "http://localhost:5000/api/generate"
-TIMEOUT = 60  # Timeout in seconds for API calls
+# Global configuration for API requests (timeouts and pooling live in llm_client)
+API_URL = os.environ.get("LLM_API_URL", "http://localhost:5000/api/generate")
 
 # Default values for model parameters
 DEFAULT_TEMPERATURE = 0.3
 DEFAULT_TOP_P = 0.7
 DEFAULT_MAX_TOKENS = 300
 
-# Function to send POST request using a persistent session and timeout
+# Rubric agents run for every essay, and how many may call the LLM at once
+AGENT_PROMPTS = [agent_1_prompt, agent_2_prompt, agent_3_prompt, agent_4_prompt]
+DEFAULT_AGENT_CONCURRENCY = int(os.environ.get("AGENT_CONCURRENCY", "1"))
+
+# "per-agent" sends one prompt per rubric criterion; "combined" grades all
+# criteria in a single call, trading some isolation for ~4x fewer tokens
+GRADING_STRATEGIES = ("per-agent", "combined")
+DEFAULT_GRADING_STRATEGY = os.environ.get("GRADING_STRATEGY", "per-agent")
+COMBINED_MAX_TOKENS = DEFAULT_MAX_TOKENS * len(AGENT_PROMPTS)
+
+# ============================
+# 🔹 Prompt Prefix Reuse
+# ============================
+# Every call for a criterion starts with the same static prefix (everything
+# before agents.PROMPT_SUFFIX), and the full prompt is always sent, so the
+# model sees exactly the conversation it was written for. The backend's own
+# prompt cache (llama.cpp/Ollama keep each slot's KV cache and reuse the
+# longest matching prefix) then skips prefilling that shared part. With
+# PREFIX_REUSE=warm each prefix is prefilled once per model before essays
+# fan out, so the first essay of a job doesn't pay for it either.
+# LLM_KEEP_ALIVE asks the backend to keep the model (and its KV cache)
+# loaded between calls. Reuse needs at least as many backend slots
+# (OLLAMA_NUM_PARALLEL) as prompts in flight with different prefixes.
+
+# Constrain replies to JSON where the backend supports it: "schema" sends the
+# expected JSON schema as `format`, "json" sends format="json", "off" neither.
+# A backend that rejects the field is stepped down to the next mode.
+OUTPUT_FORMATS = ("schema", "json", "off")
+OUTPUT_FORMAT = os.environ.get("LLM_FORMAT", "schema")
+
+# Stream replies and stop reading once the JSON object closes (LLM_STREAM=1)
+LLM_STREAM = os.environ.get("LLM_STREAM", "0") == "1"
+
+PREFIX_REUSE_MODES = ("off", "warm")
+PREFIX_REUSE = os.environ.get("PREFIX_REUSE", "off")
+if PREFIX_REUSE == "context":
+    PREFIX_REUSE = "warm"  # earlier name of this mode
+LLM_KEEP_ALIVE = os.environ.get("LLM_KEEP_ALIVE", "")
+
+_primed_prefixes = set()
+_prefix_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def render_prefix(prompt_template):
+    """Render the static part of a prompt template (it has no fields left)."""
+    if not prompt_template.endswith(PROMPT_SUFFIX):
+        raise ValueError("Prompt template must end with agents.PROMPT_SUFFIX")
+    return prompt_template[:-len(PROMPT_SUFFIX)].format()
+
+
+def build_prompt(prompt_template, essay, rag_context):
+    """Return (static prefix, full prompt) for one essay.
+
+    The prefix is byte-identical for every essay graded with the template.
+    """
+    prefix = render_prefix(prompt_template)
+    return prefix, prefix + PROMPT_SUFFIX.format(essay=essay, rag_context=rag_context)
+
+
+def prime_prefix(prefix, model):
+    """Prefill a prompt prefix into the backend's cache once per model.
+
+    Only the first caller for a prefix sends the priming request; the lock
+    is released before it, and other callers go ahead with their full
+    prompts. Returns True if this call primed the prefix.
+    """
+    if PREFIX_REUSE != "warm":
+        return False
+
+    key = (model, prefix)
+    with _prefix_lock:
+        if key in _primed_prefixes:
+            return False
+        _primed_prefixes.add(key)
+
+    payload = {"model": model, "prompt": prefix, "stream": False,
+               "max_tokens": 1, "options": {"num_predict": 1}}
+    if LLM_KEEP_ALIVE:
+        payload["keep_alive"] = LLM_KEEP_ALIVE
+    try:
+        llm_client.post_json(API_URL, payload)
+    except llm_client.LLMTransportError as e:
+        logger.warning(f"Could not prime prompt prefix: {e}")
+        return False
+    logger.info(f"Primed prompt prefix for {model} ({len(prefix)} chars)")
+    return True
+
+# Function to send POST request using the pooled keep-alive client
 
 
-def send_post_request(prompt, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP_P, max_tokens=DEFAULT_MAX_TOKENS, model="llama3.1:latest"):
-    url = API_URL
+def build_payload(prompt, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP_P, max_tokens=DEFAULT_MAX_TOKENS, model="llama3.1:latest",
+                  prefix="", schema=None):
+    """Build the /api/generate payload; the full prompt is always sent."""
     payload = {
         "model": model,  # Use the specified model
         "prompt": prompt,
@@ -44,101 +139,179 @@ def send_post_request(prompt, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP
         "top_p": top_p,
         "max_tokens": max_tokens
     }
-    headers = {
-        "Content-Type": "application/json"
-    }
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()  # Raise an error for bad status codes
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to get response from server: {e}")
+    if schema is not None and OUTPUT_FORMAT == "schema":
+        payload["format"] = schema
+    elif schema is not None and OUTPUT_FORMAT == "json":
+        payload["format"] = "json"
+    if LLM_KEEP_ALIVE:
+        payload["keep_alive"] = LLM_KEEP_ALIVE
+
+    # ✅ Make sure the shared prefix is in the backend's prompt cache
+    if prefix:
+        prime_prefix(prefix, model)
+    return payload
+
+
+@metrics.timed("llm.request")
+def send_post_request(prompt, temperature=DEFAULT_TEMPERATURE, top_p=DEFAULT_TOP_P, max_tokens=DEFAULT_MAX_TOKENS, model="llama3.1:latest",
+                      refresh_cache=False, prefix="", schema=None):
+    global OUTPUT_FORMAT
+    url = API_URL
+    while True:
+        payload = build_payload(prompt, temperature, top_p,
+                                max_tokens, model, prefix, schema)
+        try:
+            # Transport errors are already retried with backoff inside the client
+            return llm_client.post_json(url, payload, use_cache=True, refresh_cache=refresh_cache,
+                                        stream=LLM_STREAM)
+        except llm_client.LLMTransportError as e:
+            if "format" in payload and e.status in (400, 422):
+                # The backend doesn't understand this `format`; try a simpler one
+                sent = "json" if payload["format"] == "json" else "schema"
+                OUTPUT_FORMAT = max(OUTPUT_FORMAT, OUTPUT_FORMATS[OUTPUT_FORMATS.index(sent) + 1],
+                                    key=OUTPUT_FORMATS.index)
+                logger.warning(
+                    f"Backend rejected constrained output ({e}); falling back to format={OUTPUT_FORMAT}")
+                continue
+            logger.error(f"Failed to get response from server: {e}")
+            return None
+
+
+@metrics.timed("llm.parse_reply")
+def parse_reply(text, model, is_valid):
+    """Extract and validate the reply's JSON object, repairing it if needed.
+
+    Returns the object, or None if it can't be used even after repair.
+    """
+    result, repaired = extract_json_object(text)
+    if result is not None:
+        result = normalize_scores(result)
+    ok = result is not None and is_valid(result)
+    llm_client.record_parse(model, ok, repaired)
+    if not ok:
+        logger.error(f"Unusable model reply: {str(text)[:500]}")
         return None
+    if repaired:
+        logger.info("Repaired malformed JSON reply without a retry")
+    return result
 
-# Function to clean and pre-process raw response text from the model
 
+def _to_number(score):
+    # Models sometimes answer "25", "25/30" or "25 points"
+    if isinstance(score, str):
+        number = score.strip().split("/")[0].split()[0] if score.strip() else ""
+        try:
+            return float(number) if "." in number else int(number)
+        except ValueError:
+            return score
+    return score
 
-def clean_response_text(text):
-    """Ensures valid JSON formatting for responses."""
-    if not isinstance(text, str):
-        logger.error("Received non-string input for response text.")
-        return '{"score": 0, "feedback": "Invalid response format detected."}'
 
-    cleaned = text.strip()
-    if cleaned.startswith("{") and cleaned.endswith("}"):
-        try:
-            json_obj = json.loads(cleaned)
-            if isinstance(json_obj, dict) and "score" in json_obj and "feedback" in json_obj:
-                return json.dumps(json_obj)
-        except json.JSONDecodeError:
-            pass
+def normalize_scores(result):
+    """Coerce string scores to numbers, for single and combined replies."""
+    if "score" in result:
+        result["score"] = _to_number(result["score"])
+    for value in result.values():
+        if isinstance(value, dict) and "score" in value:
+            value["score"] = _to_number(value["score"])
+    return result
 
-    try:
-        cleaned = json.loads(cleaned)
-        if isinstance(cleaned, str):
-            cleaned = json.loads(cleaned)
-    except json.JSONDecodeError:
-        pass
 
-    if not isinstance(cleaned, str):
-        cleaned = json.dumps(cleaned)
+def is_feedback(result):
+    """True for a single criterion's {"score", "feedback"} object."""
+    return (isinstance(result, dict) and "feedback" in result
+            and isinstance(result.get("score"), (int, float)))
 
-    cleaned = re.sub(r'(?<!\\)"', '\\"', cleaned)
-    cleaned = re.sub(r',\s*([\]}])', r'\1', cleaned)
 
-    try:
-        json_obj = json.loads(cleaned)
-        return json.dumps(json_obj)
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}. Raw text: {cleaned}")
-        return '{"score": 0, "feedback": "Error parsing response."}'
+def is_combined_feedback(result):
+    """True for a combined reply holding feedback for every criterion."""
+    return isinstance(result, dict) and all(
+        is_feedback(result.get(key)) for key in CRITERION_KEYS)
 
 
-def run_agent(prompt_template, essay, rag_context, model="llama3.1:latest"):
-    logger.info("Running grading agent")
+def request_json(prompt, model, is_valid, max_tokens=DEFAULT_MAX_TOKENS, prefix="", schema=None):
+    """Send a prompt and parse its JSON reply, retrying unusable output.
 
-    prompt = prompt_template.format(essay=essay, rag_context=rag_context)
+    Malformed replies are repaired locally first, so a retry (a whole new
+    generation) is only spent when the reply can't be salvaged. Returns
+    (result, None) on success or (None, reason) once retries run out, where
+    reason is "server error" or "JSON error".
+    """
     max_retries = 3
 
     for attempt in range(max_retries):
-        try:
-            logger.info(f"Attempt {attempt + 1}: Generating feedback")
-            response = send_post_request(
-                prompt,
-                temperature=DEFAULT_TEMPERATURE,
-                top_p=DEFAULT_TOP_P,
-                max_tokens=DEFAULT_MAX_TOKENS,
-                model=model
-            )
-            # logger.info(f"Raw model response: {response}")
-            if response is None or "response" not in response:
-                raise ValueError("Invalid response from server")
-            feedback_text = response.get("response", "").strip()
-            feedback_text = clean_response_text(feedback_text)
-
-            feedback_json = json.loads(feedback_text)
-            if isinstance(feedback_json, dict) and "score" in feedback_json and "feedback" in feedback_json:
-                logger.info("Feedback generated successfully")
-                return feedback_json
-            else:
-                raise ValueError("Invalid JSON structure")
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                sleep_time = 2 ** attempt  # Exponential backoff
-                logger.info(f"Retrying after {sleep_time} seconds...")
-                time.sleep(sleep_time)
-            else:
-                return {"score": 0, "feedback": "Fallback response due to JSON error."}
+        logger.info(f"Attempt {attempt + 1}: Generating feedback")
+        response = send_post_request(
+            prompt,
+            temperature=DEFAULT_TEMPERATURE,
+            top_p=DEFAULT_TOP_P,
+            max_tokens=max_tokens,
+            model=model,
+            # A cached reply that failed to parse must not be served again
+            refresh_cache=attempt > 0,
+            prefix=prefix,
+            schema=schema
+        )
+        if response is None:
+            # The client already spent its transport retries
+            logger.error("LLM backend unavailable, using fallback feedback")
+            return None, "server error"
+
+        feedback_json = parse_reply(response.get("response"), model, is_valid)
+        if feedback_json is not None:
+            logger.info("Feedback generated successfully")
+            return feedback_json, None
+
+        logger.error(f"Attempt {attempt + 1} failed: unusable JSON reply")
+        if attempt < max_retries - 1:
+            # Nothing to wait out: the backend answered, the output was bad
+            llm_client.record_output_retry(model)
+
+    return None, "JSON error"
+
+
+def fallback_feedback(reason):
+    return {"score": 0, "feedback": f"Fallback response due to {reason}."}
+
+
+def run_agent(prompt_template, essay, rag_context, model="llama3.1:latest"):
+    logger.info("Running grading agent")
+
+    prefix, prompt = build_prompt(prompt_template, essay, rag_context)
+    feedback_json, error = request_json(
+        prompt, model, is_feedback, prefix=prefix, schema=feedback_schema)
+    return feedback_json if error is None else fallback_feedback(error)
+
+
+def run_combined_agent(essay, rag_context, model="llama3.1:latest"):
+    """Grade every criterion with one LLM call.
+
+    Returns one feedback dict per criterion, in AGENT_PROMPTS order, so the
+    result is interchangeable with run_agents.
+    """
+    logger.info("Running combined grading agent")
+
+    prefix, prompt = build_prompt(combined_prompt, essay, rag_context)
+    feedback_json, error = request_json(
+        prompt, model, is_combined_feedback, max_tokens=COMBINED_MAX_TOKENS, prefix=prefix,
+        schema=combined_feedback_schema)
+    if error is not None:
+        return [fallback_feedback(error) for _ in CRITERION_KEYS]
+    return [feedback_json[key] for key in CRITERION_KEYS]
 
 # Function to augment essay with RAG-based retrieval
 
 
-def augment_with_rag(essay):
+def augment_with_rag(essay, indices_path=None):
     """Retrieve relevant text directly from FAISS without predefined categories."""
     logger.info("Augmenting essay with RAG context")
 
-    relevant_docs = retrieve_relevant_text(essay)  # Direct query to FAISS
+    if not indices_path:
+        logger.warning("No FAISS index configured, grading without RAG context")
+        return "No relevant context found."
+
+    relevant_docs = retrieve_relevant_text(
+        essay, indices_path)  # Direct query to FAISS
 
     if relevant_docs:
         rag_context = "\n".join(relevant_docs)
@@ -149,23 +322,57 @@ def augment_with_rag(essay):
     return rag_context
 
 
-# Define grading function
-def grade_response(response, model="llama3.1:latest"):
-    logger.info("Grading response")
+@metrics.timed("grade.rag_contexts")
+def build_rag_contexts(essays, indices_path=None):
+    """Retrieve RAG context for every essay of a job up front.
+
+    All essays are embedded in large batches and searched with a single
+    multi-query FAISS call, instead of one encode and search per essay.
+    """
+    essays = [str(essay) for essay in essays]
+    if not indices_path:
+        logger.warning("No FAISS index configured, grading without RAG context")
+        return ["No relevant context found."] * len(essays)
 
-    # ✅ Get relevant context using RAG
-    rag_context = augment_with_rag(response)
+    logger.info(f"Retrieving RAG context for {len(essays)} essays")
+    results = retrieve_relevant_text_batch(essays, indices_path)
+    return ["\n".join(docs) if docs else "No relevant context found." for docs in results]
 
+
+def run_agents(essay, rag_context, model="llama3.1:latest", concurrency=DEFAULT_AGENT_CONCURRENCY):
+    """Run every rubric agent on one essay, at most `concurrency` at a time.
+
+    Agents are independent, so their LLM round-trips can overlap. Each agent
+    keeps its own retries and fallback inside run_agent; results come back
+    in AGENT_PROMPTS order regardless of which call finishes first.
+    """
     default_feedback = {"score": 0, "feedback": "No response generated."}
 
-    feedback_1 = run_agent(agent_1_prompt, response,
-                           rag_context, model) or default_feedback
-    feedback_2 = run_agent(agent_2_prompt, response,
-                           rag_context, model) or default_feedback
-    feedback_3 = run_agent(agent_3_prompt, response,
-                           rag_context, model) or default_feedback
-    feedback_4 = run_agent(agent_4_prompt, response,
-                           rag_context, model) or default_feedback
+    def call(prompt_template):
+        return run_agent(prompt_template, essay, rag_context, model) or default_feedback
+
+    if concurrency <= 1:
+        return [call(prompt_template) for prompt_template in AGENT_PROMPTS]
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(AGENT_PROMPTS))) as executor:
+        return list(executor.map(call, AGENT_PROMPTS))
+
+
+# Define grading function
+@metrics.timed("grade.essay")
+def grade_response(response, model="llama3.1:latest", indices_path=None, agent_concurrency=DEFAULT_AGENT_CONCURRENCY,
+                   rag_context=None, strategy=DEFAULT_GRADING_STRATEGY):
+    logger.info("Grading response")
+
+    # ✅ Get relevant context using RAG (unless the job precomputed it)
+    if rag_context is None:
+        rag_context = augment_with_rag(response, indices_path)
+
+    if strategy == "combined":
+        feedbacks = run_combined_agent(response, rag_context, model)
+    else:
+        feedbacks = run_agents(response, rag_context, model, agent_concurrency)
+    feedback_1, feedback_2, feedback_3, feedback_4 = feedbacks
 
     final_feedback = {
         "feedback_1_score": feedback_1.get("score", 0),
@@ -184,121 +391,299 @@ def grade_response(response, model="llama3.1:latest"):
     return final_feedback
 
 
-def main():
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="Grade essays with AI")
+# Output columns filled in for every essay, in the order they are appended
+# when the input workbook doesn't already have them
+COMMENT_COLUMNS = ["Comment1", "Comment2", "Comment3", "Comment4"]
+SCORE_COLUMNS = [
+    "Identification and Order of Steps (30)",
+    "Explanation of Steps (30)",
+    "Understanding the Goals of the steps(30)",
+    "Clarity and Organization(10)",
+    "Total(100)",
+]
+FEEDBACK_COLUMNS = COMMENT_COLUMNS + SCORE_COLUMNS
+
+# Essays whose RAG context is retrieved in one batched encode and search
+RAG_BATCH_SIZE = int(os.environ.get("RAG_BATCH_SIZE", "64"))
+
+
+def feedback_values(final_feedback):
+    """Map one essay's grading result onto the output columns."""
+    return {
+        "Identification and Order of Steps (30)": final_feedback["feedback_1_score"],
+        "Comment1": str(final_feedback["feedback_1_feedback"]),
+        "Explanation of Steps (30)": final_feedback["feedback_2_score"],
+        "Comment2": str(final_feedback["feedback_2_feedback"]),
+        "Understanding the Goals of the steps(30)": final_feedback["feedback_3_score"],
+        "Comment3": str(final_feedback["feedback_3_feedback"]),
+        "Clarity and Organization(10)": final_feedback["feedback_4_score"],
+        "Comment4": str(final_feedback["feedback_4_feedback"]),
+        "Total(100)": final_feedback["total_score"],
+    }
 
-    # Required arguments
-    parser.add_argument('--file', required=True,
-                        help='Path to the Excel file containing essays')
 
-    # Optional arguments
-    parser.add_argument('--model', default='llama3.1:latest',
-                        help='Model to use for grading')
-    parser.add_argument(
-        '--job-id', help='Job ID for tracking and output file naming')
-    parser.add_argument('--output-dir', default='outputs',
-                        help='Directory to save output files')
-    parser.add_argument(
-        '--professor', help='Professor username for multi-professor support')
+def iter_with_rag_contexts(rows, indices_path=None, batch_size=RAG_BATCH_SIZE):
+    """Yield (key, (row, rag_context)) for (key, row) pairs, retrieving context a batch at a time."""
+    batch = []
+    for key, row in rows:
+        batch.append((key, row))
+        if len(batch) < batch_size:
+            continue
+        contexts = build_rag_contexts(
+            [row.get("response", "") for _, row in batch], indices_path)
+        yield from ((key, (row, context)) for (key, row), context in zip(batch, contexts))
+        batch = []
+    if batch:
+        contexts = build_rag_contexts(
+            [row.get("response", "") for _, row in batch], indices_path)
+        yield from ((key, (row, context)) for (key, row), context in zip(batch, contexts))
+
+
+def iter_graded_rows(rows, grade, workers=1):
+    """Yield (key, result) for each (key, item) pair as grading finishes.
+
+    With more than one worker, results arrive in completion order, so callers
+    must write them back by key rather than by position. At most two items
+    per worker are in flight, so rows are read no faster than they're graded.
+    """
+    if workers <= 1:
+        for key, item in rows:
+            yield key, grade(key, item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    try:
+        for key, item in rows:
+            futures[executor.submit(grade, key, item)] = key
+            if len(futures) >= workers * 2:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield futures.pop(future), future.result()
+        for future in as_completed(list(futures)):
+            yield futures.pop(future), future.result()
+    finally:
+        # Don't leave queued essays running if the job failed part-way
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def resolve_indices_path(professor_username=None, project_root=None):
+    """Return the professor's FAISS index path, or None when RAG is not configured."""
+    if not professor_username or not project_root:
+        return None
+    return get_indices_path(professor_username, project_root)
 
-    args = parser.parse_args()
 
-    logger.info(f"Starting main function with file: {args.file}")
+def grade_file(file_path, model="llama3.1:latest", job_id=None, output_dir="outputs", indices_path=None,
+               agent_concurrency=DEFAULT_AGENT_CONCURRENCY, workers=1, strategy=DEFAULT_GRADING_STRATEGY,
+               resume=False):
+    """Grade every essay in an Excel file and write the graded workbook.
+
+    Used by the CLI and by the long-lived grading worker, so it must not
+    depend on process-level state such as parsed arguments.
+
+    Jobs with an ID journal every finished essay. With `resume`, the job's
+    journal supplies the input file, model and strategy; journaled rows are
+    not regraded, only copied into the rebuilt workbook. A job ID runs once
+    at a time: a second run raises job_journal.JobRunningError before it
+    touches the job's status, journal or output.
+    """
+    args = (file_path, model, job_id, output_dir, indices_path,
+            agent_concurrency, workers, strategy, resume)
+    if not job_id:
+        return _grade_file(*args)
+    with job_journal.job_lock(output_dir, job_id):
+        return _grade_file(*args)
 
+
+def _grade_file(file_path, model, job_id, output_dir, indices_path,
+                agent_concurrency, workers, strategy, resume):
     # Create output directory if it doesn't exist
-    if not os.path.exists(args.output_dir):
-        os.makedirs(args.output_dir)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # The worker process outlives jobs, so report only this job's LLM calls
+    llm_stats_before = llm_client.get_stats()
+    graded_rows = {}
+    journal_file = job_journal.journal_path(output_dir, job_id) if job_id else None
+    if resume:
+        if not journal_file or not os.path.exists(journal_file):
+            raise ValueError(f"No journal to resume for job {job_id}")
+        header, graded_rows = job_journal.read_journal(journal_file)
+        file_path, model, strategy = header["file"], header["model"], header["strategy"]
+        if job_journal.file_sha256(file_path) != header["sha256"]:
+            raise ValueError(f"Input file changed since job {job_id} started: {file_path}")
+        logger.info(f"Resuming job {job_id}: {len(graded_rows)} essays already graded")
+
+    if strategy not in GRADING_STRATEGIES:
+        raise ValueError(f"Unknown grading strategy: {strategy}")
+    logger.info(f"Starting grading for file: {file_path} ({strategy})")
 
     # Define output file name
-    output_filename = f"graded_responses_{args.job_id}.xlsx" if args.job_id else "graded_responses.xlsx"
-    output_path = os.path.join(args.output_dir, output_filename)
+    output_filename = f"graded_responses_{job_id}.xlsx" if job_id else "graded_responses.xlsx"
+    output_path = os.path.join(output_dir, output_filename)
+
+    # Create status file to track progress (written atomically, see progress.py)
+    status_path = os.path.join(output_dir, f"{job_id}.status") if job_id else None
+    job_progress = progress.JobProgress(status_path, completed=len(graded_rows))
+    job_progress.publish("processing")
 
-    # Create status file to track progress
-    if args.job_id:
-        status_path = os.path.join(args.output_dir, f"{args.job_id}.status")
-        with open(status_path, 'w') as f:
-            json.dump({"status": "processing", "progress": 0}, f)
+    # Stage timings (and profiler samples with --profile) for this job
+    job_metrics = metrics.JobMetrics(
+        os.path.join(output_dir, job_id or "grading"),
+        {"job_id": job_id or "", "model": model, "strategy": strategy}).start()
 
-    # ✅ Load the student responses from the Excel file
+    # ✅ Stream the student responses from the Excel file
+    writer = journal = None
     try:
-        df = pd.read_excel(args.file)
-        logger.info(f"Successfully loaded file with {len(df)} responses")
+        columns, total_rows, rows = excel_io.open_rows(file_path)
+        if "response" not in columns:
+            raise ValueError("Input file has no 'response' column")
+        logger.info(f"Successfully loaded file with {total_rows} responses")
 
         # Update status
-        if args.job_id:
-            with open(status_path, 'w') as f:
-                json.dump({"status": "processing",
-                          "progress": 0, "rowCount": len(df)}, f)
-
-        comment_columns = ["Comment1", "Comment2", "Comment3", "Comment4"]
-        for col in comment_columns:
-            if col not in df.columns:
-                df[col] = ""
-            df[col] = df[col].astype(str)
-
-        total_rows = len(df)
-        for index, row in df.iterrows():
-            response = row["response"]
-
+        job_progress.total = total_rows
+        job_progress.publish("processing")
+
+        # ✅ Graded rows are appended as they finish (see excel_io)
+        writer = excel_io.GradedWorkbookWriter(
+            output_path, excel_io.output_columns(columns, FEEDBACK_COLUMNS))
+        for position, values in graded_rows.items():
+            writer.add(position, values)
+
+        if journal_file:
+            journal = job_journal.JobJournal(journal_file, None if resume else {
+                "file": os.path.abspath(file_path),
+                "sha256": job_journal.file_sha256(file_path),
+                "model": model,
+                "strategy": strategy,
+            })
+
+        def grade(key, item):
+            _, index = key
+            row, rag_context = item
             # ✅ Grade response with model parameter only
             logger.info(f"Grading response {index + 1}/{total_rows}")
+            started = time.perf_counter()
             final_feedback = grade_response(
-                response,
-                model=args.model
+                str(row["response"]),
+                model=model,
+                agent_concurrency=agent_concurrency,
+                rag_context=rag_context,
+                strategy=strategy
             )
-
-            # ✅ Store feedback scores and comments in the dataframe
-            df.at[index,
-                  "Identification and Order of Steps (30)"] = final_feedback["feedback_1_score"]
-            df.at[index, "Comment1"] = str(
-                final_feedback["feedback_1_feedback"])
-            df.at[index,
-                  "Explanation of Steps (30)"] = final_feedback["feedback_2_score"]
-            df.at[index, "Comment2"] = str(
-                final_feedback["feedback_2_feedback"])
-            df.at[index,
-                  "Understanding the Goals of the steps(30)"] = final_feedback["feedback_3_score"]
-            df.at[index, "Comment3"] = str(
-                final_feedback["feedback_3_feedback"])
-            df.at[index,
-                  "Clarity and Organization(10)"] = final_feedback["feedback_4_score"]
-            df.at[index, "Comment4"] = str(
-                final_feedback["feedback_4_feedback"])
-            df.at[index, "Total(100)"] = final_feedback["total_score"]
-
-            # Update status file with progress
-            if args.job_id:
-                progress = int(((index + 1) / total_rows) * 100)
-                with open(status_path, 'w') as f:
-                    json.dump({
-                        "status": "processing",
-                        "progress": progress,
-                        "rowCount": total_rows,
-                        "completed": index + 1
-                    }, f)
+            job_progress.record_latency(time.perf_counter() - started)
+            return {**row, **feedback_values(final_feedback)}
+
+        # Rows are keyed by (read position, input row index); journaled ones are skipped
+        remaining = (((position, index), row) for position, (index, row) in enumerate(rows)
+                     if position not in graded_rows)
+        items = iter_with_rag_contexts(remaining, indices_path)
+        for (position, index), values in iter_graded_rows(items, grade, workers):
+            # ✅ Journal first so a crash after this point never regrades the essay
+            if journal:
+                with metrics.span("journal.record"):
+                    journal.record(position, index, values)
+            writer.add(position, values)
+
+            # Update status file with progress, throughput and ETA
+            job_progress.essay_done()
 
         # ✅ Save the graded responses to the output file
-        df.to_excel(output_path, index=False)
+        writer.close()
         logger.info(f"Grading completed and results saved to {output_path}")
+        logger.info(f"LLM client stats: {json.dumps(llm_client.stats_since(llm_stats_before))}")
+        logger.info(f"Job progress: {json.dumps(job_progress.snapshot())}")
+        llm_cache.evict()
 
         # Update status to complete
-        if args.job_id:
-            with open(status_path, 'w') as f:
-                json.dump({
-                    "status": "complete",
-                    "progress": 100,
-                    "rowCount": total_rows,
-                    "outputFile": output_path
-                }, f)
+        job_progress.publish("complete", progress=100, etaSeconds=0, outputFile=output_path)
+
+        return output_path
 
     except Exception as e:
         logger.error(f"Error processing file: {e}")
+        if writer is not None:
+            # Rows graded so far stay in the partial CSV
+            writer.abort()
         # Update status to error
-        if args.job_id:
-            with open(status_path, 'w') as f:
-                json.dump({"status": "error", "message": str(e)}, f)
+        job_progress.publish("error", message=str(e), etaSeconds=None,
+                             resumable=bool(journal_file and os.path.exists(journal_file)))
         raise
+    finally:
+        if journal:
+            journal.close()
+        stages = job_metrics.finish()
+        logger.info(f"Stage timings: {json.dumps(stages)}")
+
+
+def main():
+    global PREFIX_REUSE, LLM_STREAM, OUTPUT_FORMAT
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Grade essays with AI")
+
+    # Required arguments
+    parser.add_argument('--file',
+                        help='Path to the Excel file containing essays')
+
+    # Optional arguments
+    parser.add_argument('--model', default='llama3.1:latest',
+                        help='Model to use for grading')
+    parser.add_argument(
+        '--job-id', help='Job ID for tracking and output file naming')
+    parser.add_argument('--output-dir', default='outputs',
+                        help='Directory to save output files')
+    parser.add_argument('--resume', metavar='JOB_ID',
+                        help="Continue a job from its journal, grading only essays that aren't in it")
+    parser.add_argument(
+        '--professor', help='Professor username for multi-professor support')
+    parser.add_argument('--projectRoot', default=os.getcwd(),
+                        help='Absolute path to project root (used to locate FAISS indices)')
+    parser.add_argument('--agent-concurrency', type=int, default=DEFAULT_AGENT_CONCURRENCY,
+                        help='Number of rubric agents to run in parallel per essay')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of essays to grade in parallel')
+    parser.add_argument('--prefix-reuse', choices=PREFIX_REUSE_MODES, default=PREFIX_REUSE,
+                        help="Prefill each static prompt prefix once so the backend's prompt cache reuses it")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT,
+                        help='Ask the backend for schema- or JSON-constrained replies')
+    parser.add_argument('--stream', action='store_true', default=LLM_STREAM,
+                        help='Stream replies and stop reading once the JSON object is complete')
+    parser.add_argument('--strategy', choices=GRADING_STRATEGIES, default=DEFAULT_GRADING_STRATEGY,
+                        help='One LLM call per rubric criterion, or one combined call per essay')
+    parser.add_argument('--metrics-prometheus', action='store_true', default=metrics.METRICS_PROMETHEUS,
+                        help='Also write stage metrics in Prometheus textfile format')
+    parser.add_argument('--profile', action='store_true', default=metrics.PROFILE_SAMPLING,
+                        help='Run the sampling profiler and write collapsed stacks for the job')
+
+    args = parser.parse_args()
+    if not args.file and not args.resume:
+        parser.error("--file is required unless --resume is given")
+
+    logger.info(f"Starting main function with file: {args.file}")
+
+    PREFIX_REUSE = args.prefix_reuse
+    LLM_STREAM = args.stream
+    OUTPUT_FORMAT = args.output_format
+    metrics.METRICS_PROMETHEUS = args.metrics_prometheus
+    metrics.PROFILE_SAMPLING = args.profile
+
+    try:
+        grade_file(
+            args.file,
+            model=args.model,
+            job_id=args.resume or args.job_id,
+            output_dir=args.output_dir,
+            indices_path=resolve_indices_path(args.professor, args.projectRoot),
+            agent_concurrency=args.agent_concurrency,
+            workers=args.workers,
+            strategy=args.strategy,
+            resume=bool(args.resume)
+        )
+    except job_journal.JobRunningError as e:
+        # The job's status belongs to the run that holds the lock
+        logger.error(str(e))
+        raise SystemExit(job_journal.JOB_RUNNING_EXIT_CODE)
 
 
 if __name__ == "__main__":
@@ -16,10 +16,32 @@ const config = {
   },
   port: process.env.PORT || 3001,
 
+  // Essays graded in parallel per job (script.py --workers)
+  grading: {
+    workers: parseInt(process.env.GRADING_WORKERS || "1", 10),
+    // "per-agent" (one LLM call per criterion) or "combined" (one call per essay)
+    strategy: process.env.GRADING_STRATEGY || "per-agent",
+  },
+
+  // Rows returned per page when previewing an uploaded essay file
+  analysis: {
+    previewRows: parseInt(process.env.ANALYZE_PREVIEW_ROWS || "20", 10),
+  },
+
+  // Long-lived Python worker (keeps models and FAISS indices warm)
+  pythonWorker: {
+    enabled: process.env.PYTHON_WORKER_ENABLED !== "false",
+    startupTimeoutMs: parseInt(
+      process.env.PYTHON_WORKER_STARTUP_TIMEOUT_MS || "180000",
+      10
+    ),
+  },
+
   // Project paths
   paths: {
     root: PROJECT_ROOT,
     uploads: path.join(PROJECT_ROOT, "uploads"),
+    outputs: path.join(PROJECT_ROOT, "outputs"),
 
     // Get uploads path for a specific professor and optional subdirectory
     getUploadsPath: function (professorUsername, subDir = "") {
@@ -33,6 +55,14 @@ const config = {
       return subDir ? path.join(uploadsPath, subDir) : uploadsPath;
     },
 
+    // Get the grading output directory (status, journal, workbook) for a professor
+    getOutputsPath: function (professorUsername) {
+      if (!professorUsername) {
+        throw new Error("Professor username is required for path resolution");
+      }
+      return path.join(this.outputs, professorUsername);
+    },
+
     // Get python scripts path
     getPythonScriptsPath: function () {
       return path.join(PROJECT_ROOT, "python");
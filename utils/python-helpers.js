@@ -7,29 +7,40 @@ const config = require("./config");
 
 const CONDA_ENV_NAME = process.env.CONDA_ENV_NAME || "essay_bot";
 
-function runPythonInCondaEnv(
-  filePath,
-  scriptName = "rag_pipeline",
-  options = {}
-) {
-  const professorUsername = options.professor;
-
-  // Determine which Python script to run
-  let pythonScript;
+/**
+ * Locate a Python script: the professor's copy in uploads/<professor>/ if it
+ * exists, otherwise the one at the project root
+ * @param {string} scriptName - Script name without ".py"
+ * @param {string} [professorUsername] - The professor's username
+ * @returns {string} - Absolute path of the script to run
+ */
+function resolvePythonScript(scriptName, professorUsername) {
   if (professorUsername) {
     const professorScriptPath = path.join(
       config.paths.getUploadsPath(professorUsername),
       `${scriptName}.py`
     );
     if (fs.existsSync(professorScriptPath)) {
-      pythonScript = professorScriptPath;
-      logger.info(`Using professor-specific script: ${pythonScript}`);
+      logger.info(`Using professor-specific script: ${professorScriptPath}`);
+      return professorScriptPath;
     }
   }
-  if (!pythonScript) {
-    pythonScript = path.join(config.paths.root, `${scriptName}.py`);
-    logger.info(`Using default script: ${pythonScript}`);
-  }
+  const defaultScriptPath = path.join(config.paths.root, `${scriptName}.py`);
+  logger.info(`Using default script: ${defaultScriptPath}`);
+  return defaultScriptPath;
+}
+
+function runPythonInCondaEnv(
+  filePath,
+  scriptName = "rag_pipeline",
+  options = {}
+) {
+  // script.py takes the professor as --professor, the other scripts as
+  // --professorUsername; either one selects the professor's script copy
+  const pythonScript = resolvePythonScript(
+    scriptName,
+    options.professor || options.professorUsername
+  );
 
   // Build command-line arguments
   let pythonArgs = [];
@@ -43,12 +54,9 @@ function runPythonInCondaEnv(
     if (value !== undefined && value !== null) {
       pythonArgs.push(`--${key}`);
       if (value !== true) {
-        // For string values with spaces, ensure proper quoting
-        if (typeof value === "string" && value.includes(" ")) {
-          pythonArgs.push(`"${value.replace(/"/g, '\\"')}"`);
-        } else {
-          pythonArgs.push(value.toString());
-        }
+        // Passed as-is: arguments reach Python as separate argv entries
+        // (see below), so spaces and quotes need no escaping
+        pythonArgs.push(value.toString());
       }
     }
   });
@@ -59,16 +67,23 @@ function runPythonInCondaEnv(
   }
   logger.info(`Python script command arguments: ${pythonArgs.join(" ")}`);
 
-  // Use JSON.stringify to properly quote each argument
+  // The script and its arguments are bash positional parameters ("$@"), so
+  // bash never parses them: file names with spaces, quotes or `$` arrive
+  // unchanged. `exec` makes Python replace bash so kill() reaches the interpreter.
   const bashCommand =
     `source $(conda info --base)/etc/profile.d/conda.sh && ` +
     `conda activate ${CONDA_ENV_NAME} && ` +
-    `python ${JSON.stringify(pythonScript)} ` +
-    pythonArgs.map((arg) => JSON.stringify(arg)).join(" ");
+    `exec python "$@"`;
 
-  logger.info(`Bash command: ${bashCommand}`);
+  logger.info(`Bash command: ${bashCommand} (script: ${pythonScript})`);
 
-  const childProcess = spawn("bash", ["-c", bashCommand]);
+  const childProcess = spawn("bash", [
+    "-c",
+    bashCommand,
+    "bash",
+    pythonScript,
+    ...pythonArgs,
+  ]);
 
   childProcess.stdout.on("data", (data) => {
     logger.info(`Python output: ${data.toString().trim()}`);
@@ -95,6 +110,23 @@ function runPythonInCondaEnv(
   return childProcess;
 }
 
+// Index files written by rag_pipeline.py; the legacy pickle is converted on first load
+const FAISS_INDEX_FILES = ["faiss_index.faiss", "faiss_index.pkl"];
+
+/**
+ * Check whether a professor has a FAISS index (native or legacy pickle)
+ * @param {string} professorUsername - The professor's username
+ * @returns {boolean} - True if an index file exists
+ */
+function hasFaissIndex(professorUsername) {
+  const indicesDir = config.paths.getUploadsPath(professorUsername, "indices");
+  return FAISS_INDEX_FILES.some((fileName) =>
+    fs.existsSync(path.join(indicesDir, fileName))
+  );
+}
+
 module.exports = {
+  resolvePythonScript,
   runPythonInCondaEnv,
+  hasFaissIndex,
 };
@@ -0,0 +1,227 @@
+// utils/python-worker.js
+const http = require("http");
+const fs = require("fs");
+const path = require("path");
+const logger = require("./logger");
+const config = require("./config");
+const { runPythonInCondaEnv } = require("./python-helpers");
+
+// One long-lived grading worker per professor: professorUsername -> Promise<{ port, process, jobs }>
+// `jobs` maps the job IDs handed to the worker to their status file paths.
+const workers = new Map();
+
+/**
+ * Mark a job as failed unless it already finished
+ * @param {string} statusPath - The job's .status file
+ * @param {string} message - Why the job failed
+ * @returns {boolean} - True if the status was changed
+ */
+function markJobFailed(statusPath, message) {
+  let status = {};
+  try {
+    status = JSON.parse(fs.readFileSync(statusPath, "utf8"));
+  } catch (error) {
+    // No status yet (the job never started) or unreadable; write a fresh one
+  }
+  if (status.status === "complete" || status.status === "error") {
+    return false;
+  }
+
+  // Same atomic replace as progress.write_status, so pollers never see a torn file
+  const journalPath = statusPath.replace(/\.status$/, ".journal.jsonl");
+  const tmpPath = `${statusPath}.${process.pid}.tmp`;
+  fs.writeFileSync(
+    tmpPath,
+    JSON.stringify({
+      ...status,
+      status: "error",
+      message,
+      etaSeconds: null,
+      resumable: fs.existsSync(journalPath),
+      updatedAt: Date.now() / 1000,
+    })
+  );
+  fs.renameSync(tmpPath, statusPath);
+  return true;
+}
+
+/**
+ * Start (or reuse) the warm Python worker for a professor
+ * @param {string} professorUsername - The professor's username
+ * @returns {Promise<{port: number, process: ChildProcess}>} - Resolves once the worker is listening
+ */
+function getWorker(professorUsername) {
+  if (workers.has(professorUsername)) {
+    return workers.get(professorUsername);
+  }
+
+  const jobs = new Map();
+  const starting = new Promise((resolve, reject) => {
+    const workerProcess = runPythonInCondaEnv(null, "grading_worker", {
+      professorUsername,
+      projectRoot: config.paths.root,
+    });
+
+    let stdoutBuffer = "";
+    let ready = false;
+
+    const timer = setTimeout(() => {
+      if (!ready) {
+        workerProcess.kill();
+        reject(new Error("Timed out waiting for Python worker to start"));
+      }
+    }, config.pythonWorker.startupTimeoutMs);
+
+    workerProcess.stdout.on("data", (data) => {
+      if (ready) return;
+      stdoutBuffer += data.toString();
+
+      // The worker prints a single JSON line once its server is bound
+      for (const line of stdoutBuffer.split("\n")) {
+        try {
+          const message = JSON.parse(line);
+          if (message.ready) {
+            ready = true;
+            clearTimeout(timer);
+            logger.info(
+              `Python worker for ${professorUsername} ready on port ${message.port}`
+            );
+            resolve({ port: message.port, process: workerProcess, jobs });
+            return;
+          }
+        } catch (error) {
+          // Not the ready line yet
+        }
+      }
+    });
+
+    workerProcess.on("exit", (code, signal) => {
+      clearTimeout(timer);
+      // The next request starts a fresh worker
+      if (workers.get(professorUsername) === starting) {
+        workers.delete(professorUsername);
+      }
+      logger.warn(
+        `Python worker for ${professorUsername} exited with code ${code}${
+          signal ? ` (${signal})` : ""
+        }`
+      );
+      if (!ready) {
+        reject(new Error(`Python worker exited with code ${code}`));
+      }
+
+      // Jobs still running in the worker died with it
+      for (const [jobId, statusPath] of jobs) {
+        try {
+          if (markJobFailed(statusPath, `Grading worker exited (code ${code})`)) {
+            logger.error(`Grading job ${jobId} failed: worker exited`);
+          }
+        } catch (error) {
+          logger.error(`Could not update status of ${jobId}: ${error.message}`);
+        }
+      }
+      jobs.clear();
+    });
+  });
+
+  workers.set(professorUsername, starting);
+  starting.catch(() => {
+    if (workers.get(professorUsername) === starting) {
+      workers.delete(professorUsername);
+    }
+  });
+  return starting;
+}
+
+/**
+ * Send a JSON request to a professor's worker
+ * @param {string} professorUsername - The professor's username
+ * @param {string} route - Worker route, e.g. "/grade"
+ * @param {Object} body - JSON payload
+ * @returns {Promise<Object>} - Parsed JSON response
+ */
+async function callWorker(professorUsername, route, body = {}) {
+  if (!config.pythonWorker.enabled) {
+    throw new Error("Python worker is disabled");
+  }
+
+  const { port, jobs } = await getWorker(professorUsername);
+  const payload = JSON.stringify(body);
+
+  const result = await new Promise((resolve, reject) => {
+    const request = http.request(
+      {
+        host: "127.0.0.1",
+        port,
+        path: route,
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "Content-Length": Buffer.byteLength(payload),
+        },
+      },
+      (response) => {
+        let data = "";
+        response.on("data", (chunk) => {
+          data += chunk;
+        });
+        response.on("end", () => {
+          try {
+            const result = JSON.parse(data);
+            if (response.statusCode >= 400) {
+              const error = new Error(
+                result.error || `Worker returned ${response.statusCode}`
+              );
+              error.status = response.statusCode;
+              return reject(error);
+            }
+            resolve(result);
+          } catch (error) {
+            reject(new Error(`Invalid worker response: ${error.message}`));
+          }
+        });
+      }
+    );
+
+    request.on("error", reject);
+    request.write(payload);
+    request.end();
+  });
+
+  if (route === "/grade" && body.jobId && body.outputDir) {
+    // Drop jobs that finished since the last one started
+    for (const [jobId, statusPath] of jobs) {
+      try {
+        const { status } = JSON.parse(fs.readFileSync(statusPath, "utf8"));
+        if (status === "complete" || status === "error") jobs.delete(jobId);
+      } catch (error) {
+        // Not written yet; keep tracking it
+      }
+    }
+    jobs.set(body.jobId, path.join(body.outputDir, `${body.jobId}.status`));
+  }
+  return result;
+}
+
+/**
+ * Stop all running workers (used on server shutdown)
+ */
+async function stopWorkers() {
+  for (const [professorUsername, starting] of workers) {
+    try {
+      const { process: workerProcess } = await starting;
+      workerProcess.kill();
+      logger.info(`Stopped Python worker for ${professorUsername}`);
+    } catch (error) {
+      // Worker never started; nothing to stop
+    }
+  }
+  workers.clear();
+}
+
+module.exports = {
+  callWorker,
+  getWorker,
+  markJobFailed,
+  stopWorkers,
+};